@@ -0,0 +1,88 @@
+import argparse
+import os
+import time
+
+import numpy as np
+from prettytable import PrettyTable
+
+from mock_quote_server import MockQuoteServer
+
+
+def make_codes(n):
+    """ 生成 n 个合成代码，沪深各半 """
+    codes = []
+    for i in range(n):
+        if i % 2 == 0:
+            codes.append('%06d' % (600000 + i // 2))
+        else:
+            codes.append('%06d' % (1 + i // 2))
+    return codes
+
+
+def measure(func, rounds):
+    latencies = []
+    for _ in range(rounds):
+        t_start = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - t_start)
+    return np.array(latencies)
+
+
+def add_result(table, case, size, latencies):
+    p50, p90, p99 = np.percentile(latencies, [50, 90, 99]) * 1000.0
+    throughput = size * len(latencies) / latencies.sum()
+    table.add_row([case, size, len(latencies), f'{p50:.1f}', f'{p90:.1f}', f'{p99:.1f}', f'{throughput:.0f}'])
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='fetch path benchmark against the local mock quote server')
+    arg_parser.add_argument('--sizes', type=int, nargs='+', default=[10, 100, 1000, 5000])
+    arg_parser.add_argument('--rounds', type=int, default=20)
+    arg_parser.add_argument('--latency', type=float, default=0.03)
+    arg_parser.add_argument('--jitter', type=float, default=0.01)
+    arg_parser.add_argument('--error-rate', type=float, default=0.0)
+    arg_parser.add_argument('--name-codes', type=int, default=20,
+                            help='codes resolved by get_stock_name (one request per code)')
+    args = arg_parser.parse_args()
+
+    server = MockQuoteServer(latency=args.latency, jitter=args.jitter, error_rate=args.error_rate).start()
+    # 把本地服务器设为 HTTP 代理，grabber 和 get_stock_names 无需修改即可打到本地
+    os.environ['http_proxy'] = server.url
+    os.environ['HTTP_PROXY'] = server.url
+    os.environ.pop('NO_PROXY', None)
+    os.environ.pop('no_proxy', None)
+
+    from price_grabber import Price_Grabber
+    from get_stock_names import get_stock_name, StockNameResolver
+
+    grabbers = [('grab', Price_Grabber()), ('grab concurrent', Price_Grabber(concurrent=True))]
+    table = PrettyTable(['case', 'codes', 'rounds', 'p50 ms', 'p90 ms', 'p99 ms', 'codes/s'])
+    table.align = 'r'
+    for size in args.sizes:
+        codes = make_codes(size)
+        for case, pg in grabbers:
+            add_result(table, case, size, measure(lambda: pg.grab(codes), args.rounds))
+        add_result(table, 'grab_records', size, measure(lambda: grabbers[0][1].grab_records(codes), args.rounds))
+        # 只测解析，不含网络
+        stocks_dict = grabbers[0][1].quotation.real(codes)
+        add_result(table, 'parse_dict', size, measure(lambda: grabbers[0][1].parse_dict(stocks_dict), args.rounds))
+    name_codes = make_codes(args.name_codes)
+    add_result(table, 'get_stock_name', len(name_codes),
+               measure(lambda: [get_stock_name(code) for code in name_codes], max(1, args.rounds // 10)))
+    for size in args.sizes:
+        codes = make_codes(size)
+        # 冷启动: 不带缓存文件，每轮新建；热缓存: 同一个 resolver 重复解析
+        add_result(table, 'resolve names (cold)', size,
+                   measure(lambda: StockNameResolver(cache_path=None).resolve(codes), args.rounds))
+        resolver = StockNameResolver(cache_path=None)
+        resolver.resolve(codes)
+        add_result(table, 'resolve names (cached)', size, measure(lambda: resolver.resolve(codes), args.rounds))
+    for _, pg in grabbers:
+        pg.close()
+    server.shutdown()
+    print(f'latency={args.latency}s jitter={args.jitter}s error_rate={args.error_rate}')
+    print(table)
+
+
+if __name__ == '__main__':
+    main()
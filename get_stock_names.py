@@ -1,12 +1,28 @@
 import requests
 import json
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 
-# Function to get stock name from code
-def get_stock_name(stock_code):
-    # Shanghai/Shenzhen stocks (6/0/3/2/8/9 prefix)
+NAME_API = 'http://qt.gtimg.cn/q='
+CACHE_PATH = 'stock_names_cache.json'
+CACHE_TTL = 7 * 24 * 3600  # seconds, names rarely change
+BATCH_SIZE = 60  # codes per request, same limit easyquotation uses for tencent
+
+
+# Shanghai/Shenzhen stocks (6/0/3/2/8/9 prefix), returns None for unsupported codes
+def market_code(stock_code):
     if stock_code.startswith(('6', '0', '3', '2', '8', '9')):
         market = 'sh' if stock_code.startswith(('6', '5', '9')) else 'sz'
-        url = f'http://qt.gtimg.cn/q={market}{stock_code}'
+        return market + stock_code
+    return None
+
+
+# Function to get stock name from code
+def get_stock_name(stock_code):
+    code = market_code(stock_code)
+    if code is not None:
+        url = NAME_API + code
         try:
             response = requests.get(url, timeout=5)
             if response.status_code == 200:
@@ -18,13 +34,93 @@ def get_stock_name(stock_code):
             print(f"Error fetching {stock_code}: {e}")
     return f"Unknown ({stock_code})"
 
-# Load portfolio data
-with open('portfolio.json') as f:
-    portfolios = json.load(f)
 
-# Get and print stock names for each portfolio
-for portfolio, codes in portfolios.items():
-    print(f"\nPortfolio {portfolio}:")
-    for code in codes:
-        name = get_stock_name(code)
-        print(f"{code}: {name}")
+def parse_names(text):
+    """Parse a multi-symbol response (v_sh600000="1~Name~600000~...";) into {market_code: name}"""
+    names = {}
+    for line in text.split(';'):
+        line = line.strip()
+        if not line.startswith('v_') or '="' not in line:
+            continue
+        key, value = line[2:].split('="', 1)
+        data = value.split('~')
+        if len(data) > 1 and data[1]:
+            names[key] = data[1]
+    return names
+
+
+class StockNameResolver:
+    """Resolve many codes with batched multi-symbol requests and a persistent code -> name cache
+
+    The cache file stores {code: [name, fetched_at]}, entries older than ttl seconds are fetched again.
+    """
+    def __init__(self, cache_path=CACHE_PATH, ttl=CACHE_TTL, batch_size=BATCH_SIZE, workers=4, timeout=5):
+        self.cache_path = cache_path
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.workers = workers
+        self.timeout = timeout
+        self.session = requests.Session()
+        self.cache = {}
+        if cache_path and os.path.exists(cache_path):
+            try:
+                with open(cache_path, encoding='utf-8') as f:
+                    self.cache = json.load(f)
+            except (OSError, ValueError) as e:
+                print(f"Ignoring broken name cache {cache_path}: {e}")
+
+    def fetch_batch(self, codes):
+        try:
+            response = self.session.get(NAME_API + ','.join(codes), timeout=self.timeout)
+            if response.status_code == 200:
+                return parse_names(response.text)
+        except Exception as e:
+            print(f"Error fetching {codes[0]}..{codes[-1]}: {e}")
+        return {}
+
+    def resolve(self, stock_codes):
+        """Return {code: name} for every requested code, unresolved codes get 'Unknown (code)'"""
+        now = time.time()
+        unique_codes = list(dict.fromkeys(stock_codes))
+        missing = [code for code in unique_codes
+                   if code not in self.cache or now - self.cache[code][1] > self.ttl]
+        to_fetch = {}
+        for code in missing:
+            m_code = market_code(code)
+            if m_code is not None:
+                to_fetch[m_code] = code
+        if to_fetch:
+            m_codes = list(to_fetch)
+            batches = [m_codes[i:i + self.batch_size] for i in range(0, len(m_codes), self.batch_size)]
+            with ThreadPoolExecutor(max_workers=min(self.workers, len(batches))) as executor:
+                for names in executor.map(self.fetch_batch, batches):
+                    for m_code, name in names.items():
+                        if m_code in to_fetch:
+                            self.cache[to_fetch[m_code]] = [name, now]
+            self.save()
+        return {code: self.cache[code][0] if code in self.cache else f"Unknown ({code})"
+                for code in unique_codes}
+
+    def save(self):
+        if not self.cache_path:
+            return
+        tmp_path = self.cache_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.cache, f, ensure_ascii=False)
+        os.replace(tmp_path, self.cache_path)
+
+
+if __name__ == '__main__':
+    # Load portfolio data
+    with open('portfolio.json') as f:
+        portfolios = json.load(f)
+
+    # Resolve every code of every portfolio at once, repeated codes are only looked up once
+    all_codes = [code for codes in portfolios.values() for code in codes]
+    names = StockNameResolver().resolve(all_codes)
+
+    # Get and print stock names for each portfolio
+    for portfolio, codes in portfolios.items():
+        print(f"\nPortfolio {portfolio}:")
+        for code in codes:
+            print(f"{code}: {names[code]}")
@@ -0,0 +1,130 @@
+import argparse
+import random
+import threading
+import time
+import zlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import unquote, urlsplit
+
+
+class QuoteGenerator:
+    """ 合成行情：每个代码的昨收由代码哈希决定，现价在昨收附近随机游走 """
+    def __init__(self, seed=0):
+        self.seed = seed
+        self.prices = {}
+        self.lock = threading.Lock()
+
+    def quote(self, market_code):
+        code = market_code[-6:]
+        rng = random.Random(zlib.crc32(market_code.encode()) + self.seed)
+        prev_close = round(rng.uniform(3.0, 80.0), 3 if code[0] in '51' else 2)
+        with self.lock:
+            price = self.prices.get(market_code, prev_close)
+            price = min(max(price * (1 + random.gauss(0, 0.002)), prev_close * 0.9), prev_close * 1.1)
+            self.prices[market_code] = price
+        high = max(price, prev_close * 1.01)
+        low = min(price, prev_close * 0.99)
+        return dict(name=f'合成{code}', code=code, prev_close=prev_close, price=price, high=high, low=low,
+                    ratio=(price - prev_close) / prev_close * 100.0, now=time.localtime())
+
+    def tencent(self, market_code):
+        q = self.quote(market_code)
+        fields = ['0'] * 53
+        fields[0] = '1'
+        fields[1] = q['name']
+        fields[2] = q['code']
+        fields[3] = '%.3f' % q['price']
+        fields[4] = '%.3f' % q['prev_close']
+        fields[5] = '%.3f' % q['prev_close']
+        fields[29] = ''
+        fields[30] = time.strftime('%Y%m%d%H%M%S', q['now'])
+        fields[31] = '%.3f' % (q['price'] - q['prev_close'])
+        fields[32] = '%.2f' % q['ratio']
+        fields[33] = '%.3f' % q['high']
+        fields[34] = '%.3f' % q['low']
+        fields[35] = ''
+        fields[40] = ''
+        return f'v_{market_code}="' + '~'.join(fields) + '";\n'
+
+    def sina(self, market_code):
+        q = self.quote(market_code)
+        fields = ['0'] * 33
+        fields[0] = q['name']
+        fields[1] = '%.3f' % q['prev_close']
+        fields[2] = '%.3f' % q['prev_close']
+        fields[3] = '%.3f' % q['price']
+        fields[4] = '%.3f' % q['high']
+        fields[5] = '%.3f' % q['low']
+        fields[30] = time.strftime('%Y-%m-%d', q['now'])
+        fields[31] = time.strftime('%H:%M:%S', q['now'])
+        fields[32] = '00'
+        return f'var hq_str_{market_code}="' + ','.join(fields) + '";\n'
+
+
+class QuoteHandler(BaseHTTPRequestHandler):
+    """ 同时支持直接请求 (/q=...) 和作为 HTTP 代理收到的绝对地址 (http://qt.gtimg.cn/q=...) """
+    protocol_version = 'HTTP/1.1'
+
+    def do_GET(self):
+        server = self.server
+        delay = server.latency + random.uniform(-server.jitter, server.jitter)
+        if delay > 0:
+            time.sleep(delay)
+        if random.random() < server.error_rate:
+            self.reply(502, b'upstream error')
+            return
+        path = unquote(urlsplit(self.path).path if self.path.startswith('http') else self.path)
+        if path.startswith('/q='):
+            render = server.generator.tencent
+            codes = path[3:]
+        elif path.startswith('/list='):
+            render = server.generator.sina
+            codes = path[6:]
+        else:
+            self.reply(404, b'not found')
+            return
+        body = ''.join(render(code) for code in codes.split(',') if code)
+        self.reply(200, body.encode('gbk'))
+
+    def reply(self, status, body):
+        self.send_response(status)
+        self.send_header('Content-Type', 'text/plain; charset=GBK')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class MockQuoteServer(ThreadingHTTPServer):
+    """ 本地模拟的腾讯/新浪行情服务器，可配置延迟、抖动和错误率 """
+    daemon_threads = True
+
+    def __init__(self, host='127.0.0.1', port=0, latency=0.0, jitter=0.0, error_rate=0.0, seed=0):
+        super().__init__((host, port), QuoteHandler)
+        self.latency = latency
+        self.jitter = jitter
+        self.error_rate = error_rate
+        self.generator = QuoteGenerator(seed)
+
+    @property
+    def url(self):
+        return f'http://{self.server_address[0]}:{self.server_address[1]}'
+
+    def start(self):
+        thread = threading.Thread(target=self.serve_forever, daemon=True)
+        thread.start()
+        return self
+
+
+if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser(description='local stand-in for qt.gtimg.cn / hq.sinajs.cn')
+    arg_parser.add_argument('--port', type=int, default=8765)
+    arg_parser.add_argument('--latency', type=float, default=0.05, help='seconds per request')
+    arg_parser.add_argument('--jitter', type=float, default=0.02, help='uniform +- seconds added to latency')
+    arg_parser.add_argument('--error-rate', type=float, default=0.0, help='probability of a 502 response')
+    args = arg_parser.parse_args()
+    server = MockQuoteServer(port=args.port, latency=args.latency, jitter=args.jitter, error_rate=args.error_rate)
+    print(f'Mock quote server on {server.url}, use it as http_proxy to intercept qt.gtimg.cn / hq.sinajs.cn')
+    server.serve_forever()
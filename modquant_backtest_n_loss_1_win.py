@@ -1,72 +1,121 @@
+import numpy as np
+import pandas as pd
+
+from modquant_metrics import compute_metrics
+from modquant_win_lose_seq import read_win_lose, text_to_bits, bits_to_text, loss_runs
+
+SWEEP_MAX = 10  # main 中一次扫描的最大连败阈值
+
+
+def read_win_lose_sequence(file_path):
+    """ 读取胜负序列文件（文本或位压缩格式），返回布尔数组 (胜为 True)，出错或为空时返回 None """
+    try:
+        is_win = read_win_lose(file_path)
+    except Exception as e:
+        print(f"读取文件时出错: {e}")
+        return None
+
+    # 检查序列是否为空
+    if len(is_win) == 0:
+        print("胜负序列为空")
+        return None
+    return is_win
+
+
+def sweep_consecutive_losses(win_lose_sequence, max_losses=SWEEP_MAX):
+    """
+    一次计算连败阈值 N = 1..max_losses 的跟单结果
+
+    跟单以胜利结束，胜利又会清零连败计数，所以每段连败互不影响：
+    长度为 L 的连败在 L >= N 时触发一轮跟单，跟单 L - N + 1 次负（含触发的那次），
+    后面紧跟胜利时再加 1 次胜。对连败长度做直方图后，各 N 的结果都是后缀和，
+    整体为 O(序列长度 + max_losses)，和单个 N 的 analyze_consecutive_losses_strategy 结果一致。
+
+    参数:
+    win_lose_sequence (str 或 bool 数组): 胜负序列，布尔数组中胜为 True
+    max_losses (int): 扫描的最大连败阈值
+
+    返回:
+    DataFrame: 每个 N 一行
+    """
+    if isinstance(win_lose_sequence, str):
+        win_lose_sequence = text_to_bits(win_lose_sequence)
+    _, lengths, closed = loss_runs(win_lose_sequence)
+    size = max(max_losses, int(lengths.max()) if len(lengths) else 0) + 2
+    # run_cnt[L]: 长度为 L 的连败段数，closed_cnt[L]: 其中后面紧跟胜利的段数
+    run_cnt = np.bincount(lengths, minlength=size)
+    closed_cnt = np.bincount(lengths[closed], minlength=size)
+    # rounds[N] = sum(run_cnt[L], L >= N)，losses[N] = sum((L - N + 1) * run_cnt[L], L >= N) = sum(rounds[M], M >= N)
+    rounds = np.cumsum(run_cnt[::-1])[::-1]
+    losses = np.cumsum(rounds[::-1])[::-1]
+    wins = np.cumsum(closed_cnt[::-1])[::-1]
+
+    n = np.arange(1, max_losses + 1)
+    trades = wins[n] + losses[n]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        win_rate = np.where(trades > 0, wins[n] / trades * 100, 0.0)
+    return pd.DataFrame({
+        '连败触发阈值': n,
+        '跟单轮数': rounds[n],
+        '总跟单次数': trades,
+        '总胜利次数': wins[n],
+        '总亏损次数': losses[n],
+        '总胜率': win_rate,
+    })
+
+
+def follow_rounds(is_win, consecutive_losses):
+    """
+    N连败后跟单直到一次胜利的各轮跟单
+
+    跟单以胜利结束，胜利又清零连败计数，所以每轮跟单都落在一段连败（及其后的胜利）里：
+    长度 >= N 的连败从第 N 个负开始跟单（这个负也算跟单中的一个），到紧跟的胜利或序列结尾结束。
+
+    返回:
+    (round_starts, round_ends, follow_mask): 各轮起止下标（不含 round_ends）和被跟单的位置 (布尔数组)
+    """
+    is_win = np.asarray(is_win, dtype=bool)
+    starts, lengths, closed = loss_runs(is_win)
+    triggered = lengths >= consecutive_losses
+    round_starts = starts[triggered] + consecutive_losses - 1
+    round_ends = starts[triggered] + lengths[triggered] + closed[triggered]
+    follow_delta = np.zeros(len(is_win) + 1, dtype=np.int64)
+    follow_delta[round_starts] += 1
+    follow_delta[round_ends] -= 1
+    return round_starts, round_ends, np.cumsum(follow_delta[:-1]) > 0
+
+
 def analyze_consecutive_losses_strategy(file_path, consecutive_losses=2):
     """
     分析连败后跟单策略的胜率
 
     参数:
-    file_path (str): 包含胜负序列的文件路径
+    file_path (str): 包含胜负序列的文件路径，文本或位压缩格式
     consecutive_losses (int): 触发跟单的连续亏损次数
 
     返回:
     dict: 包含跟单结果的字典
     """
     # 读取胜负序列
-    try:
-        with open(file_path, 'r', encoding='utf-8') as f:
-            win_lose_sequence = f.read().strip()
-    except Exception as e:
-        print(f"读取文件时出错: {e}")
-        return None
-
-    # 检查序列是否为空
-    if not win_lose_sequence:
-        print("胜负序列为空")
+    is_win = read_win_lose_sequence(file_path)
+    if is_win is None:
         return None
 
-    print(f"原始胜负序列: {win_lose_sequence}")
+    win_lose_text = bits_to_text(is_win)
+    print(f"原始胜负序列: {win_lose_text}")
     print(f"策略: 等待{consecutive_losses}连败后跟单，直到一次胜利")
 
-    # 初始化变量
-    following = False  # 是否处于跟单状态
-    loss_count = 0  # 当前连败计数
-
-    follow_trades = []  # 记录所有跟单交易
-    current_follow_streak = []  # 当前一轮跟单
-
-    # 遍历胜负序列
-    for i, result in enumerate(win_lose_sequence):
-        if not following:  # 未在跟单状态
-            if result == '负':
-                loss_count += 1
-                if loss_count >= consecutive_losses:
-                    # 触发跟单条件
-                    following = True
-                    loss_count = 0
-                    print(f"位置 {i + 1}: 检测到{consecutive_losses}连败，开始跟单")
-                    # 当前这个负也要算作跟单中的一个
-                    current_follow_streak.append(result)
-            else:
-                # 遇到胜，重置连败计数
-                loss_count = 0
-        else:  # 已在跟单状态
-            # 记录当前交易
-            current_follow_streak.append(result)
-
-            if result == '胜':
-                # 跟单成功，停止跟单，等待下一次触发
-                following = False
-                follow_trades.append(current_follow_streak)
-                print(f"位置 {i + 1}: 跟单获胜，结束本轮跟单，本轮结果: {''.join(current_follow_streak)}")
-                current_follow_streak = []
-
-    # 处理序列结束时仍在跟单的情况
-    if following and current_follow_streak:
-        follow_trades.append(current_follow_streak)
-        print(f"序列结束，最后一轮跟单未结束，结果: {''.join(current_follow_streak)}")
-
-    # 统计结果
-    total_followed = sum(len(streak) for streak in follow_trades)
-    wins = sum(streak.count('胜') for streak in follow_trades)
-    losses = sum(streak.count('负') for streak in follow_trades)
+    round_starts, round_ends, follow_mask = follow_rounds(is_win, consecutive_losses)
+    follow_trades = [win_lose_text[start:end] for start, end in zip(round_starts.tolist(), round_ends.tolist())]
+    for start, end, streak in zip(round_starts.tolist(), round_ends.tolist(), follow_trades):
+        print(f"位置 {start + 1}: 检测到{consecutive_losses}连败，开始跟单")
+        if win_lose_text[end - 1] == '胜':
+            print(f"位置 {end}: 跟单获胜，结束本轮跟单，本轮结果: {streak}")
+        else:
+            print(f"序列结束，最后一轮跟单未结束，结果: {streak}")
+
+    # 统计结果：序列没有盈亏，每次胜记 +1、负记 -1，最大回撤等以次数为单位
+    metrics = compute_metrics(np.where(is_win, 1.0, -1.0), follow_mask, is_win)
 
     # 计算每轮跟单的结果
     round_results = []
@@ -78,27 +127,26 @@ def analyze_consecutive_losses_strategy(file_path, consecutive_losses=2):
             '跟单次数': len(streak),
             '胜': round_wins,
             '负': round_losses,
-            '结果': ''.join(streak)
+            '结果': streak
         })
 
-    # 计算胜率
-    win_rate = wins / total_followed * 100 if total_followed > 0 else 0
-
     return {
         '连败触发阈值': consecutive_losses,
         '跟单轮数': len(follow_trades),
-        '总跟单次数': total_followed,
-        '总胜利次数': wins,
-        '总亏损次数': losses,
-        '总胜率': win_rate,
+        '总跟单次数': metrics['交易段数'],
+        '总胜利次数': metrics['胜利段数'],
+        '总亏损次数': metrics['亏损段数'],
+        '总胜率': metrics['胜率'] * 100,
+        '最大连败': metrics['最大连败'],
+        '最大回撤': int(metrics['最大回撤']),
         '详细轮次': round_results,
-        '跟单序列': [''.join(streak) for streak in follow_trades]
+        '跟单序列': follow_trades
     }
 
 
 def main():
-    # 文件路径，应该是包含胜负序列的txt文件
-    file_path = 'ag_250424_win_lose_seq.txt'
+    # 文件路径，包含胜负序列的位压缩文件 (.bin) 或txt文件
+    file_path = 'ag_250424_win_lose_seq.bin'
 
     # 设置连败阈值
     try:
@@ -118,13 +166,15 @@ def main():
         print(f"总胜利次数: {results['总胜利次数']}")
         print(f"总亏损次数: {results['总亏损次数']}")
         print(f"总胜率: {results['总胜率']:.2f}%")
+        print(f"最大连败: {results['最大连败']}")
+        print(f"最大回撤(次): {results['最大回撤']}")
 
         print("\n各轮次跟单详情:")
         for round_info in results['详细轮次']:
             print(f"第{round_info['轮次']}轮: {round_info['结果']} (胜:{round_info['胜']}, 负:{round_info['负']})")
 
         # 保存结果到文件
-        output_file = file_path.rsplit('_win_lose_seq.txt', 1)[0] + f'_follow_n{consecutive_losses}_analysis.txt'
+        output_file = file_path.rsplit('_win_lose_seq', 1)[0] + f'_follow_n{consecutive_losses}_analysis.txt'
         with open(output_file, 'w', encoding='utf-8') as f:
             f.write(f"连败跟单策略分析结果 (N={consecutive_losses})\n")
             f.write(f"连败触发阈值: {results['连败触发阈值']}\n")
@@ -132,7 +182,9 @@ def main():
             f.write(f"总跟单次数: {results['总跟单次数']}\n")
             f.write(f"总胜利次数: {results['总胜利次数']}\n")
             f.write(f"总亏损次数: {results['总亏损次数']}\n")
-            f.write(f"总胜率: {results['总胜率']:.2f}%\n\n")
+            f.write(f"总胜率: {results['总胜率']:.2f}%\n")
+            f.write(f"最大连败: {results['最大连败']}\n")
+            f.write(f"最大回撤(次): {results['最大回撤']}\n\n")
 
             f.write("各轮次跟单详情:\n")
             for round_info in results['详细轮次']:
@@ -141,6 +193,11 @@ def main():
 
         print(f"\n分析结果已保存至: {output_file}")
 
+        # 一次扫描各连败阈值，方便选择 N
+        sweep = sweep_consecutive_losses(read_win_lose_sequence(file_path), SWEEP_MAX)
+        print(f"\n连败阈值扫描 (N = 1..{SWEEP_MAX}):")
+        print(sweep.to_string(index=False, formatters={'总胜率': '{:.2f}%'.format}))
+
 
 if __name__ == "__main__":
     main()
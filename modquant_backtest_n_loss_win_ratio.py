@@ -1,135 +1,217 @@
+from collections import deque
+
 import pandas as pd
 import numpy as np
 
+from modquant_metrics import compute_metrics
+
+WALK_FORWARD_WINDOW = 100  # main 中滚动窗口的段数
+
+
+class LossStreakFollower:
+    """
+    连败跟单策略的增量状态机，每次输入一段的结果 ('胜'/'负')，O(1) 更新
+
+    未跟单时累计连败，达到 consecutive_losses 时开始跟单，触发的这一段也计入本轮；
+    跟单中用本轮的胜场数和段数计算胜率，达到 target_win_rate (%) 时结束本轮。
+    既可以在回测中逐段喂入 CSV 的结果，也可以在实盘中每收盘一段喂入一次。
+
+    Attributes:
+        following: 是否处于跟单状态，即下一段是否跟单
+        loss_count: 未跟单时的当前连败数
+        round_wins: 本轮跟单的胜场数
+        round_trades: 本轮跟单的段数
+        rounds: 已开始的跟单轮数
+    """
+    def __init__(self, consecutive_losses=2, target_win_rate=40.0):
+        self.consecutive_losses = consecutive_losses
+        self.target_win_rate = target_win_rate
+        self.following = False
+        self.loss_count = 0
+        self.round_wins = 0
+        self.round_trades = 0
+        self.rounds = 0
+
+    def update(self, result):
+        """
+        输入一段的结果，'胜'/'负' 或布尔值（胜为 True，如位压缩序列）
+
+        返回:
+        bool: 这一段是否被策略选中（计入策略交易）
+        """
+        is_win = result == '胜' if isinstance(result, str) else bool(result)
+        if not self.following:
+            if not is_win:
+                self.loss_count += 1
+                if self.loss_count >= self.consecutive_losses:
+                    self.following = True
+                    self.loss_count = 0
+                    self.round_wins = 0
+                    self.round_trades = 1
+                    self.rounds += 1
+                    return True
+            else:
+                self.loss_count = 0
+            return False
+        self.round_trades += 1
+        if is_win:
+            self.round_wins += 1
+        # 统计当前跟单胜率
+        win_rate = self.round_wins / self.round_trades * 100
+        if win_rate >= self.target_win_rate:
+            self.following = False
+        return True
+
+
+def backtest_follow_mask(results_seq, consecutive_losses=2, target_win_rate=40.0):
+    """ 批量回测：对整个结果序列运行 LossStreakFollower，返回被选中段的布尔掩码 """
+    follower = LossStreakFollower(consecutive_losses, target_win_rate)
+    return np.fromiter((follower.update(result) for result in results_seq), dtype=bool, count=len(results_seq))
+
 
 def analyze_strategy_from_csv(csv_path, consecutive_losses=2, target_win_rate=40.0):
     """
     按照连败跟单策略，基于csv每段交易详情进行回测，
     统计策略交易的胜率、赔率、胜负中位数、最大连败次数、总盈利
     """
+    return analyze_strategy(read_segments_csv(csv_path), consecutive_losses, target_win_rate)
+
+
+def read_segments_csv(csv_path):
     df = pd.read_csv(csv_path, encoding='utf-8')
     # 兼容无表头情况
     if df.columns[0] != '段号' and not df.columns[0].startswith('Unnamed'):
         df.columns = ['段号','交易方向','开始日期','结束日期','交易笔数','盈利笔数','亏损笔数','总盈亏','结果']
+    return df
 
-    results_seq = df['结果'].tolist()
-    profits_seq = df['总盈亏'].tolist()
 
+def analyze_strategy(df, consecutive_losses=2, target_win_rate=40.0, verbose=True):
+    """
+    对 analyze_trades 得到的分段结果 (DataFrame) 回测连败跟单策略，不经过中间文件
+    verbose 为 False 时不输出统计，只返回结果
+    """
     # 策略回测主逻辑
-    following = False
-    loss_count = 0
-    follow_indices = []  # 记录所有被策略选中的段的索引
-    current_follow = []  # 当前一轮跟单的索引
-
-    for i, result in enumerate(results_seq):
-        if not following:
-            if result == '负':
-                loss_count += 1
-                if loss_count >= consecutive_losses:
-                    following = True
-                    loss_count = 0
-                    current_follow = [i]
-            else:
-                loss_count = 0
-        else:
-            current_follow.append(i)
-            # 统计当前跟单胜率
-            streak_results = [results_seq[idx] for idx in current_follow]
-            wins = streak_results.count('胜')
-            win_rate = wins / len(streak_results) * 100
-            if win_rate >= target_win_rate:
-                follow_indices.extend(current_follow)
-                following = False
-                current_follow = []
-    # 处理结尾还在跟单的情况
-    if following and current_follow:
-        follow_indices.extend(current_follow)
-
-    # 去重并保持顺序
-    follow_indices = sorted(set(follow_indices), key=follow_indices.index)
-
-    # 提取策略选中的段的数据
-    strat_df = df.iloc[follow_indices]
-    strat_results = strat_df['结果'].tolist()
-    strat_profits = strat_df['总盈亏'].tolist()
-
-    win_count = strat_results.count('胜')
-    lose_count = strat_results.count('负')
-    total = len(strat_results)
-    win_rate = win_count / total if total > 0 else 0
-
-    win_profit = strat_df[strat_df['结果']=='胜']['总盈亏'].sum()
-    lose_profit = strat_df[strat_df['结果']=='负']['总盈亏'].sum()
-    payout_ratio = win_profit / abs(lose_profit) if lose_profit != 0 else np.nan
-
-    win_median = strat_df[strat_df['结果']=='胜']['总盈亏'].median() if win_count > 0 else np.nan
-    lose_median = strat_df[strat_df['结果']=='负']['总盈亏'].median() if lose_count > 0 else np.nan
-
-    # 最大连败次数（只统计策略选中的段）
-    max_consec_lose = 0
-    current_lose = 0
-    for res in strat_results:
-        if res == '负':
-            current_lose += 1
-            max_consec_lose = max(max_consec_lose, current_lose)
-        else:
-            current_lose = 0
-
-    total_profit = sum(strat_profits)
+    follow_mask = backtest_follow_mask(df['结果'].tolist(), consecutive_losses, target_win_rate)
+
+    # 策略和全跟单用同一个指标函数，区别只是选择掩码
+    profits = df['总盈亏'].to_numpy()
+    is_win = (df['结果'] == '胜').to_numpy()
+    strat = compute_metrics(profits, follow_mask, is_win)
+    follow_all = compute_metrics(profits, None, is_win)
 
     # 输出
-    print(f"策略实际交易段数: {total}")
-    print(f"策略胜率: {win_rate*100:.2f}% ({win_count}/{total})")
-    print(f"策略赔率(盈亏比): {payout_ratio:.2f}")
-    print(f"策略胜的中位数: {win_median}")
-    print(f"策略负的中位数: {lose_median}")
-    print(f"策略最大连败次数: {max_consec_lose}")
-    print(f"策略总盈利: {total_profit}")
-    print("-"*40)
-
-    # 全跟单策略
-    all_results = df['结果'].tolist()
-    all_profits = df['总盈亏'].tolist()
-    all_win_count = all_results.count('胜')
-    all_lose_count = all_results.count('负')
-    all_total = len(all_results)
-    all_win_rate = all_win_count / all_total if all_total > 0 else 0
-    all_win_profit = df[df['结果']=='胜']['总盈亏'].sum()
-    all_lose_profit = df[df['结果']=='负']['总盈亏'].sum()
-    all_payout_ratio = all_win_profit / abs(all_lose_profit) if all_lose_profit != 0 else float('nan')
-    all_win_median = df[df['结果']=='胜']['总盈亏'].median() if all_win_count > 0 else float('nan')
-    all_lose_median = df[df['结果']=='负']['总盈亏'].median() if all_lose_count > 0 else float('nan')
-    all_max_consec_lose = 0
-    all_current_lose = 0
-    for res in all_results:
-        if res == '负':
-            all_current_lose += 1
-            all_max_consec_lose = max(all_max_consec_lose, all_current_lose)
-        else:
-            all_current_lose = 0
-    all_total_profit = sum(all_profits)
-
-    print(f"全跟单策略段数: {all_total}")
-    print(f"全跟单胜率: {all_win_rate*100:.2f}% ({all_win_count}/{all_total})")
-    print(f"全跟单赔率(盈亏比): {all_payout_ratio:.2f}")
-    print(f"全跟单胜的中位数: {all_win_median}")
-    print(f"全跟单负的中位数: {all_lose_median}")
-    print(f"全跟单最大连败次数: {all_max_consec_lose}")
-    print(f"全跟单总盈利: {all_total_profit}")
+    if verbose:
+        print_metrics('策略', strat, '策略实际交易段数')
+        print("-"*40)
+        print_metrics('全跟单', follow_all, '全跟单策略段数')
 
     # 返回详细轮次
     return {
-        '策略交易段数': total,
-        '策略胜率': win_rate,
-        '策略赔率': payout_ratio,
-        '策略胜中位数': win_median,
-        '策略负中位数': lose_median,
-        '策略最大连败': max_consec_lose,
-        '策略总盈利': total_profit,
-        '策略明细': strat_df.reset_index(drop=True)
+        '策略交易段数': strat['交易段数'],
+        '策略胜利段数': strat['胜利段数'],
+        '策略胜率': strat['胜率'],
+        '策略赔率': strat['赔率'],
+        '策略胜中位数': strat['胜中位数'],
+        '策略负中位数': strat['负中位数'],
+        '策略最大连败': strat['最大连败'],
+        '策略总盈利': strat['总盈利'],
+        '策略最大回撤': strat['最大回撤'],
+        '策略最长回撤段数': strat['最长回撤段数'],
+        '策略权益曲线': strat['权益曲线'],
+        '全跟单指标': follow_all,
+        '策略明细': df[follow_mask].reset_index(drop=True)
     }
 
 
+def print_metrics(name, metrics, count_label):
+    print(f"{count_label}: {metrics['交易段数']}")
+    print(f"{name}胜率: {metrics['胜率']*100:.2f}% ({metrics['胜利段数']}/{metrics['交易段数']})")
+    print(f"{name}赔率(盈亏比): {metrics['赔率']:.2f}")
+    print(f"{name}胜的中位数: {metrics['胜中位数']}")
+    print(f"{name}负的中位数: {metrics['负中位数']}")
+    print(f"{name}最大连败次数: {metrics['最大连败']}")
+    print(f"{name}总盈利: {metrics['总盈利']}")
+    print(f"{name}最大回撤: {metrics['最大回撤']}")
+    print(f"{name}最长回撤段数: {metrics['最长回撤段数']}")
+
+
+class RollingWindowStats:
+    """
+    最近 window 段的滚动统计，每加入一段 O(1) 更新：新段计入，滑出窗口的段扣除
+
+    每段记录 (是否被策略选中, 是否为胜, 盈亏)，同时统计策略选中的段和窗口内全部段（全跟单）
+
+    浮点盈亏反复加减会留下舍入误差，对应的段数为 0 时把累计值清零，
+    否则最后一个亏损段滑出窗口后亏损合计是一个极小的非零数，赔率会变成极大值
+    """
+    def __init__(self, window=100):
+        self.window = window
+        self.segments = deque()
+        self.trades = 0
+        self.wins = 0
+        self.losses = 0  # 亏损不为 0 的选中段数，为 0 时赔率为 NaN
+        self.win_profit = 0.0
+        self.lose_profit = 0.0
+        self.all_wins = 0
+        self.all_profit = 0.0
+
+    def add(self, selected, is_win, profit, sign=1):
+        if selected:
+            self.trades += sign
+            if is_win:
+                self.wins += sign
+                self.win_profit = self.win_profit + sign * profit if self.wins else 0.0
+            elif profit != 0:
+                self.losses += sign
+                self.lose_profit = self.lose_profit + sign * profit if self.losses else 0.0
+        if is_win:
+            self.all_wins += sign
+        self.all_profit += sign * profit
+
+    def push(self, selected, is_win, profit):
+        self.segments.append((selected, is_win, profit))
+        self.add(selected, is_win, profit)
+        if len(self.segments) > self.window:
+            self.add(*self.segments.popleft(), sign=-1)
+
+    def full(self):
+        return len(self.segments) == self.window
+
+    def snapshot(self):
+        """ 当前窗口的胜率 (0~1)、赔率、总盈利，以及全跟单的胜率和总盈利 """
+        return {
+            '窗口交易段数': self.trades,
+            '窗口胜率': self.wins / self.trades if self.trades > 0 else np.nan,
+            '窗口赔率': self.win_profit / abs(self.lose_profit) if self.losses > 0 else np.nan,
+            '窗口总盈利': self.win_profit + self.lose_profit,
+            '全跟单胜率': self.all_wins / len(self.segments) if self.segments else np.nan,
+            '全跟单总盈利': self.all_profit,
+        }
+
+
+def walk_forward(df, consecutive_losses=2, target_win_rate=40.0, window=100, step=1):
+    """
+    滚动窗口回测：策略在全部历史上连续运行（与实盘一致），
+    每 step 段输出一次最近 window 段内策略的胜率、赔率、总盈利，总耗时与历史长度成线性
+
+    返回:
+    DataFrame: 每个窗口一行，以窗口最后一段的段号和结束日期标识
+    """
+    follower = LossStreakFollower(consecutive_losses, target_win_rate)
+    stats = RollingWindowStats(window)
+    rows = []
+    segment_ids = df['段号'].to_numpy() if '段号' in df.columns else np.arange(len(df))
+    end_dates = df['结束日期'].to_numpy() if '结束日期' in df.columns else segment_ids
+    for i, (result, profit) in enumerate(zip(df['结果'].tolist(), df['总盈亏'].tolist())):
+        selected = follower.update(result)
+        stats.push(selected, result == '胜', profit)
+        if stats.full() and (i + 1 - window) % step == 0:
+            row = {'段号': segment_ids[i], '结束日期': end_dates[i]}
+            row.update(stats.snapshot())
+            rows.append(row)
+    return pd.DataFrame(rows)
+
+
 def main():
     csv_path = 'im_250425_analysis.csv'
     try:
@@ -152,6 +234,8 @@ def main():
         print(f"策略负的中位数: {results['策略负中位数']}")
         print(f"策略最大连败: {results['策略最大连败']}")
         print(f"策略总盈利: {results['策略总盈利']}")
+        print(f"策略最大回撤: {results['策略最大回撤']}")
+        print(f"策略最长回撤段数: {results['策略最长回撤段数']}")
         # 保存明细
         output_file = csv_path.rsplit('.csv', 1)[0] + f'_winrate{int(target_win_rate)}_n{consecutive_losses}_strategy_analysis.txt'
         with open(output_file, 'w', encoding='utf-8') as f:
@@ -162,10 +246,18 @@ def main():
             f.write(f"策略胜的中位数: {results['策略胜中位数']}\n")
             f.write(f"策略负的中位数: {results['策略负中位数']}\n")
             f.write(f"策略最大连败: {results['策略最大连败']}\n")
-            f.write(f"策略总盈利: {results['策略总盈利']}\n\n")
+            f.write(f"策略总盈利: {results['策略总盈利']}\n")
+            f.write(f"策略最大回撤: {results['策略最大回撤']}\n")
+            f.write(f"策略最长回撤段数: {results['策略最长回撤段数']}\n\n")
             f.write("策略明细:\n")
             results['策略明细'].to_string(f, index=False)
         print(f"\n策略明细已保存至: {output_file}")
 
+        # 滚动窗口表现
+        walk = walk_forward(read_segments_csv(csv_path), consecutive_losses, target_win_rate, WALK_FORWARD_WINDOW)
+        walk_file = csv_path.rsplit('.csv', 1)[0] + f'_winrate{int(target_win_rate)}_n{consecutive_losses}_walkforward_w{WALK_FORWARD_WINDOW}.csv'
+        walk.to_csv(walk_file, index=False, encoding='utf-8-sig')
+        print(f"滚动窗口 ({WALK_FORWARD_WINDOW} 段) 表现已保存至: {walk_file}")
+
 if __name__ == "__main__":
     main()
@@ -0,0 +1,115 @@
+import argparse
+import glob
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from modquant_list_parse import analyze_trades, REVERSE_COUNT
+from modquant_backtest_n_loss_1_win import follow_rounds
+from modquant_backtest_n_loss_win_ratio import analyze_strategy
+from modquant_metrics import compute_metrics
+
+SUMMARY_COLUMNS = ['合约', '策略', '连败阈值', '目标胜率', '交易段数', '胜利段数', '胜率',
+                   '赔率', '最大连败', '总盈利']
+
+
+def backtest_file(file_path, losses_list, win_rates, reverse_count=REVERSE_COUNT):
+    """
+    单个合约的完整流程：解析成交记录 -> 分段 -> 两种连败跟单回测，全部在内存中完成
+
+    返回:
+    list: 每个策略和参数组合一行 (dict)，解析失败时为空
+    """
+    instrument = os.path.splitext(os.path.basename(file_path))[0]
+    segments = analyze_trades(file_path, reverse_count=reverse_count)
+    if segments is None:
+        return []
+    rows = []
+
+    # N连败后跟单直到一次胜利：每个 N 由连败段得到跟单掩码，和目标胜率策略用同一个指标函数
+    profits = segments['总盈亏'].to_numpy()
+    is_win = (segments['结果'] == '胜').to_numpy()
+    for consecutive_losses in losses_list:
+        _, _, follow_mask = follow_rounds(is_win, consecutive_losses)
+        result = compute_metrics(profits, follow_mask, is_win)
+        rows.append({
+            '合约': instrument,
+            '策略': '连败跟单至胜',
+            '连败阈值': consecutive_losses,
+            '目标胜率': float('nan'),
+            '交易段数': result['交易段数'],
+            '胜利段数': result['胜利段数'],
+            '胜率': result['胜率'] * 100,
+            '赔率': result['赔率'],
+            '最大连败': result['最大连败'],
+            '总盈利': result['总盈利'],
+        })
+
+    # N连败后跟单直到本轮胜率达到目标
+    for consecutive_losses in losses_list:
+        for target_win_rate in win_rates:
+            result = analyze_strategy(segments, consecutive_losses, target_win_rate, verbose=False)
+            rows.append({
+                '合约': instrument,
+                '策略': '连败跟单至目标胜率',
+                '连败阈值': consecutive_losses,
+                '目标胜率': target_win_rate,
+                '交易段数': result['策略交易段数'],
+                '胜利段数': result['策略胜利段数'],
+                '胜率': result['策略胜率'] * 100,
+                '赔率': result['策略赔率'],
+                '最大连败': result['策略最大连败'],
+                '总盈利': result['策略总盈利'],
+            })
+    return rows
+
+
+def run_batch(file_paths, losses_list, win_rates, reverse_count=REVERSE_COUNT, workers=None):
+    """ 用进程池并行回测多个合约，返回汇总表 """
+    rows = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        futures = {executor.submit(backtest_file, path, losses_list, win_rates, reverse_count): path
+                   for path in file_paths}
+        for future, path in futures.items():
+            try:
+                rows.extend(future.result())
+            except Exception as e:
+                print(f"{path} 回测出错: {e}")
+    return pd.DataFrame(rows, columns=SUMMARY_COLUMNS)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='batch backtest of every trade export in a directory')
+    arg_parser.add_argument('directory', help='directory of tab-separated trade exports')
+    arg_parser.add_argument('--pattern', default='*.txt', help='file name pattern of trade exports')
+    arg_parser.add_argument('--losses', type=int, nargs='+', default=[1, 2, 3, 4, 5],
+                            help='consecutive loss thresholds N')
+    arg_parser.add_argument('--win-rates', type=float, nargs='+', default=[40.0],
+                            help='target win rates (%%) of the win-ratio strategy')
+    arg_parser.add_argument('--reverse-count', type=int, default=REVERSE_COUNT,
+                            help='reverse trades needed to start a new segment')
+    arg_parser.add_argument('--workers', type=int, default=None, help='process count, default all cores')
+    arg_parser.add_argument('--output', default='batch_summary.csv', help='summary csv path')
+    args = arg_parser.parse_args()
+
+    # 跳过上一次运行留下的胜负序列等中间文件
+    file_paths = sorted(path for path in glob.glob(os.path.join(args.directory, args.pattern))
+                        if not path.endswith(('_win_lose_seq.txt', '_analysis.txt')))
+    if not file_paths:
+        print(f"{args.directory} 中没有匹配 {args.pattern} 的文件")
+        return
+
+    t_start = time.time()
+    summary = run_batch(file_paths, args.losses, args.win_rates, args.reverse_count, args.workers)
+    print(f"{len(file_paths)} 个文件，用时 {time.time() - t_start:.2f}s")
+
+    summary.to_csv(args.output, index=False, encoding='utf-8-sig')
+    with pd.option_context('display.max_rows', None, 'display.width', 200):
+        print(summary.to_string(index=False, float_format='{:.2f}'.format))
+    print(f"\n汇总结果已保存至: {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,205 @@
+import argparse
+import time
+
+import numpy as np
+import pandas as pd
+from numpy.lib.stride_tricks import sliding_window_view
+
+BATCH_SIZE = 10000  # 每批同时回测的重采样数，控制 (段数 × 批大小) 数组的内存
+
+
+def resample(is_win, profits, size, method='permutation', block_size=10, rng=None):
+    """
+    生成 size 条重采样序列，返回形状为 (段数, size) 的 (is_win, profits)，每一列是一条序列
+
+    method:
+    'permutation': 打乱顺序（置换检验，原假设为胜负与时间顺序无关）
+    'block': 循环块自助法，随机起点、长度 block_size 的连续块拼接，保留块内的自相关
+    """
+    rng = np.random.default_rng() if rng is None else rng
+    n = len(is_win)
+    if method == 'permutation':
+        # 每条序列按随机键排序得到置换：随机 64 位整数的低位换成下标，整体排序后低位就是打乱后的下标。
+        # 随机数整块生成、排序走向量化路径，比 rng.permuted 逐个抽取有界随机数快一倍多；
+        # 高位相同 (概率约 n^2 / 2^(65 - 下标位数)) 时按原顺序排，可以忽略
+        index_bits = np.uint64(max(n - 1, 1).bit_length())
+        keys = rng.bit_generator.random_raw((size, n))
+        keys <<= index_bits
+        keys |= np.arange(n, dtype=np.uint64)
+        keys.sort(axis=1)
+        keys &= (np.uint64(1) << index_bits) - np.uint64(1)
+        indices = keys.view(np.intp)
+        return np.take(is_win, indices).T, np.take(profits, indices).T
+    if method == 'block':
+        block_cnt = -(-n // block_size)
+        starts = rng.integers(0, n, size=(block_cnt, size), dtype=np.int32)
+
+        def gather(values):
+            # 首尾相接后按块取滑动窗口，一次取出整块，不逐个元素计算下标
+            windows = sliding_window_view(np.concatenate([values, values[:block_size - 1]]), block_size)
+            return windows[starts].transpose(0, 2, 1).reshape(block_cnt * block_size, size)[:n]
+        return gather(is_win), gather(profits)
+    raise ValueError(f"unknown resample method: {method}")
+
+
+def min_wins_table(max_trades, target_win_rate):
+    """
+    本轮 trades 段中至少要赢几段才达到目标胜率，下标为 trades
+
+    按 LossStreakFollower 的浮点公式 wins / trades * 100 >= target_win_rate 修正取整，
+    回测中用查表代替每一步的除法
+    """
+    trades = np.arange(max_trades + 1)
+    reached = lambda wins: wins / trades * 100 >= target_win_rate
+    with np.errstate(invalid='ignore', divide='ignore'):
+        wins = np.maximum(np.ceil(target_win_rate * trades / 100.0), 0).astype(np.int64)
+        wins = np.where(reached(np.maximum(wins - 1, 0)), np.maximum(wins - 1, 0), wins)
+        wins = np.where(reached(wins), wins, wins + 1)
+    wins[0] = np.iinfo(np.int32).max
+    return wins.astype(np.int32)
+
+
+def run_strategy_batch(is_win, profits, consecutive_losses=2, target_win_rate=40.0):
+    """
+    对多条序列同时运行连败跟单策略 (与 LossStreakFollower 相同的规则)
+
+    只在时间方向上循环，每一步用数组同时推进全部序列的状态机
+
+    参数:
+    is_win (ndarray): (段数, 序列数) 布尔数组
+    profits (ndarray): (段数, 序列数) 每段盈亏
+
+    返回:
+    dict: 每条序列的交易段数、胜利段数、胜段盈利、负段亏损、总盈利
+    """
+    n, size = is_win.shape
+    is_loss = ~is_win
+    min_wins = min_wins_table(n + 1, target_win_rate)
+    idle = np.ones(size, dtype=bool)
+    loss_count = np.zeros(size, dtype=np.int32)
+    round_wins = np.zeros(size, dtype=np.int32)
+    round_trades = np.zeros(size, dtype=np.int32)
+    selected = np.empty(is_win.shape, dtype=bool)  # 每一步每条序列是否被策略选中
+
+    for t in range(n):
+        loss = is_loss[t]
+        # 未跟单：负累计连败，胜清零；跟单中连败数保持为 0
+        loss_count += 1
+        loss_count *= loss & idle
+        # 达到阈值开始跟单，触发的这一段也计入本轮
+        trigger = loss_count >= consecutive_losses
+        loss_count *= ~trigger
+        following = ~idle
+        np.logical_or(following, trigger, out=selected[t])
+        # 跟单中：更新本轮计数，达到目标胜率结束本轮（刚触发的段不检查）
+        round_trades *= following
+        round_trades += selected[t]
+        round_wins *= following
+        round_wins += following & ~loss
+        idle = ~selected[t] | (following & (round_wins >= min_wins[round_trades]))
+
+    selected_win = selected & is_win
+    # 布尔掩码按 uint8 参与 einsum，按列求和时不产生 (段数, 序列数) 的浮点临时数组
+    win_profit = np.einsum('ij,ij->j', profits, selected_win.view(np.uint8))
+    total_profit = np.einsum('ij,ij->j', profits, selected.view(np.uint8))
+    return {'trades': np.count_nonzero(selected, axis=0), 'wins': np.count_nonzero(selected_win, axis=0),
+            'win_profit': win_profit, 'lose_profit': total_profit - win_profit, 'total_profit': total_profit}
+
+
+def follow_all_batch(is_win, profits):
+    """ 全跟单基准，返回格式同 run_strategy_batch """
+    win_profit = np.einsum('ij,ij->j', profits, is_win.view(np.uint8))
+    total_profit = profits.sum(axis=0)
+    return {'trades': np.full(is_win.shape[1], is_win.shape[0]), 'wins': np.count_nonzero(is_win, axis=0),
+            'win_profit': win_profit, 'lose_profit': total_profit - win_profit, 'total_profit': total_profit}
+
+
+def strategy_metrics(stats):
+    """ 胜率 (%)、赔率、总盈利，没有交易或没有亏损时为 NaN """
+    with np.errstate(invalid='ignore', divide='ignore'):
+        win_rate = np.where(stats['trades'] > 0, stats['wins'] / stats['trades'] * 100, np.nan)
+        payout_ratio = np.where(stats['lose_profit'] != 0, stats['win_profit'] / np.abs(stats['lose_profit']), np.nan)
+    return {'胜率': win_rate, '赔率': payout_ratio, '总盈利': np.asarray(stats['total_profit'], dtype=np.float64)}
+
+
+def bootstrap_strategy(results, profits, consecutive_losses=2, target_win_rate=40.0, n_resamples=100000,
+                       method='block', block_size=10, confidence=0.95, batch_size=BATCH_SIZE, seed=None):
+    """
+    重采样检验策略的胜率、赔率、总盈利是否显著
+
+    permutation: p 值为打乱顺序后策略指标 >= 实际值的比例（单侧），区间为打乱后指标的分布区间
+    block: 区间为块自助法下策略指标的置信区间，p 值为同一条重采样上策略指标 <= 全跟单指标的比例
+
+    参数:
+    results: 每段结果 ('胜'/'负' 或布尔值)
+    profits: 每段总盈亏
+
+    返回:
+    DataFrame: 每个指标一行
+    """
+    results = np.asarray(results)
+    is_win = results == '胜' if results.dtype.kind in 'US' or results.dtype == object else results.astype(bool)
+    profits = np.asarray(profits, dtype=np.float64)
+    profits32 = profits.astype(np.float32)  # 重采样数组用 float32，内存和带宽减半
+    rng = np.random.default_rng(seed)
+
+    observed = strategy_metrics(run_strategy_batch(is_win[:, None], profits[:, None],
+                                                   consecutive_losses, target_win_rate))
+    baseline = strategy_metrics(follow_all_batch(is_win[:, None], profits[:, None]))
+    samples = {name: [] for name in observed}
+    diffs = {name: [] for name in observed}
+    for batch_start in range(0, n_resamples, batch_size):
+        size = min(batch_size, n_resamples - batch_start)
+        batch_win, batch_profits = resample(is_win, profits32, size, method, block_size, rng)
+        metrics = strategy_metrics(run_strategy_batch(batch_win, batch_profits, consecutive_losses, target_win_rate))
+        base_metrics = strategy_metrics(follow_all_batch(batch_win, batch_profits))
+        for name in observed:
+            samples[name].append(metrics[name])
+            diffs[name].append(metrics[name] - base_metrics[name])
+
+    alpha = (1 - confidence) / 2
+    rows = []
+    for name in observed:
+        sample = np.concatenate(samples[name])
+        valid = sample[~np.isnan(sample)]
+        if method == 'permutation':
+            extreme, count = np.count_nonzero(valid >= observed[name][0]), len(valid)
+        else:
+            diff = np.concatenate(diffs[name])
+            diff = diff[~np.isnan(diff)]
+            extreme, count = np.count_nonzero(diff <= 0), len(diff)
+        low, high = np.percentile(valid, [alpha * 100, (1 - alpha) * 100]) if len(valid) else (np.nan, np.nan)
+        rows.append({
+            '指标': name,
+            '策略': observed[name][0],
+            '全跟单': baseline[name][0],
+            '重采样均值': valid.mean() if len(valid) else np.nan,
+            '区间下限': low,
+            '区间上限': high,
+            'p值': (extreme + 1) / (count + 1),
+        })
+    return pd.DataFrame(rows)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description='resampling significance test of the loss-streak strategy')
+    arg_parser.add_argument('csv_path', help='segment csv written by modquant_list_parse')
+    arg_parser.add_argument('--losses', type=int, default=2, help='consecutive loss threshold N')
+    arg_parser.add_argument('--win-rate', type=float, default=40.0, help='target win rate (%%) that ends a round')
+    arg_parser.add_argument('--resamples', type=int, default=100000)
+    arg_parser.add_argument('--method', choices=['block', 'permutation'], default='block')
+    arg_parser.add_argument('--block-size', type=int, default=10)
+    arg_parser.add_argument('--confidence', type=float, default=0.95)
+    arg_parser.add_argument('--seed', type=int, default=None)
+    args = arg_parser.parse_args()
+
+    df = pd.read_csv(args.csv_path, encoding='utf-8')
+    t_start = time.time()
+    table = bootstrap_strategy(df['结果'].to_numpy(), df['总盈亏'].to_numpy(), args.losses, args.win_rate,
+                               args.resamples, args.method, args.block_size, args.confidence, seed=args.seed)
+    print(f"{len(df)} 段，{args.resamples} 次重采样 ({args.method})，用时 {time.time() - t_start:.2f}s")
+    print(table.to_string(index=False, float_format='{:.4f}'.format))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,115 +1,205 @@
+import io
+from datetime import datetime
+from itertools import islice
+
 import pandas as pd
 import numpy as np
-
-
-def analyze_trades(file_path):
-    # 读取txt文件
-    try:
-        rows = []
-        with open(file_path, 'r', encoding='utf-8') as file:
-            lines = file.readlines()
-
-            # 跳过可能的标题行
-            start_idx = 0
-            if '进场日期' in lines[0] and '出场日期' in lines[0]:
-                start_idx = 1
-
-            # 处理数据行
-            for i in range(start_idx, len(lines)):
-                line = lines[i].strip()
-                if not line:  # 跳过空行
-                    continue
-
-                # 使用制表符(\t)分割
-                cols = line.split('\t')
-                if len(cols) == 7:  # 确保有正确的列数
-                    rows.append(cols)
-                else:
-                    print(f"警告：行 {i + 1} 格式不正确，列数 = {len(cols)}，内容: {line}")
-
-        # 创建DataFrame
-        if rows:
-            df = pd.DataFrame(rows, columns=['进场日期', '出场日期', '进场价格', '出场价格',
-                                             '单笔盈亏', '累计毛收益', '累计净收益'])
+from pandas.tseries.api import guess_datetime_format
+
+from modquant_win_lose_seq import write_packed
+
+
+TRADE_COLUMNS = ['进场日期', '出场日期', '进场价格', '出场价格', '单笔盈亏', '累计毛收益', '累计净收益']
+DATE_COLUMNS = ['进场日期', '出场日期']
+PRICE_COLUMNS = ['进场价格', '出场价格', '单笔盈亏', '累计毛收益', '累计净收益']
+CHUNK_SIZE = 200000  # 每块行数，内存占用只和块大小有关
+MAX_BAD_LINES = 20  # 最多记录的格式错误行样例，其余只计数
+# pandas 推断不出的日期格式，按顺序尝试
+KNOWN_DATE_FORMATS = ['%Y年%m月%d日 %H:%M:%S', '%Y年%m月%d日 %H:%M', '%Y年%m月%d日']
+REVERSE_COUNT = 3  # 连续几笔反向单切换主方向、开始新段
+
+
+class BadLines:
+    """ 读取过程中的格式错误行（跳过的行、无法解析的值），读完后汇总输出一次 """
+    def __init__(self):
+        self.count = 0
+        self.samples = []
+
+    def add(self, sample):
+        self.count += 1
+        if len(self.samples) < MAX_BAD_LINES:
+            self.samples.append(sample)
+
+    def report(self):
+        if self.count:
+            more = '\n  ...' if self.count > len(self.samples) else ''
+            print(f"警告：{self.count} 行格式不正确:\n  " + '\n  '.join(self.samples) + more)
+
+
+def infer_date_format(value):
+    """ 由一个日期字符串推断格式，推断不出时为 None """
+    date_format = guess_datetime_format(value)
+    if date_format is not None:
+        return date_format
+    for date_format in KNOWN_DATE_FORMATS:
+        try:
+            datetime.strptime(value, date_format)
+            return date_format
+        except ValueError:
+            pass
+    return None
+
+
+def parse_dates(raw, date_format):
+    """
+    按固定格式解析日期列，无法解析的值保留原字符串
+
+    返回:
+    (values, failed): 全部解析成功时 values 为 datetime64，否则为 Timestamp 与原字符串混合的 object 列；
+                      failed 为解析失败的行（空值也算）
+    """
+    if date_format is None:
+        parsed = pd.Series(pd.NaT, index=raw.index, dtype='datetime64[ns]')
+    else:
+        parsed = pd.to_datetime(raw, format=date_format, errors='coerce')
+    failed = parsed.isna().to_numpy()
+    if failed.any():
+        return parsed.astype(object).where(~failed, raw), failed
+    return parsed, failed
+
+
+def read_trades(file_path, chunksize=CHUNK_SIZE, bad_lines=None):
+    """ 分块读取制表符分隔的 7 列成交记录，逐块返回类型化的 DataFrame
+
+    日期格式由每列第一个日期推断一次，整个文件共用，结果与分块大小无关；
+    日期列为 datetime64，无法按该格式解析的日期保留原字符串（该块的列变为 object）。
+    价格和盈亏列为 float64，无法解析的值为 NaN。
+    列数不是 7 的行被跳过，含无法解析的值的行保留，二者都以行号记录到 bad_lines (BadLines)，不逐行打印。
+    """
+    field_cnt = len(TRADE_COLUMNS)
+    date_formats = {}  # 日期列 -> 推断出的格式
+    with open(file_path, 'rb') as file:
+        first_line = file.readline()
+        # 跳过可能的标题行
+        if '进场日期'.encode('utf-8') in first_line and '出场日期'.encode('utf-8') in first_line:
+            line_number = 1
         else:
-            print("没有找到有效数据行")
-            return None
-
+            file.seek(0)
+            line_number = 0
+        while True:
+            lines = list(islice(file, chunksize))
+            if not lines:
+                break
+            # 按制表符个数筛掉列数不对的行，行号在这里计数，解析器只收到格式正确的行
+            tab_counts = [line.count(b'\t') for line in lines]
+            line_numbers = np.arange(line_number + 1, line_number + 1 + len(lines))
+            if any(count != field_cnt - 1 for count in tab_counts):
+                good_lines = []
+                good_offsets = []
+                for offset, (line, count) in enumerate(zip(lines, tab_counts)):
+                    if count == field_cnt - 1:
+                        good_lines.append(line)
+                        good_offsets.append(offset)
+                    elif line.strip() and bad_lines is not None:
+                        bad_lines.add(f"行 {line_number + offset + 1}，列数 = {count + 1}，已跳过")
+                lines = good_lines
+                line_numbers = line_numbers[good_offsets]
+            line_number += len(tab_counts)
+            if not lines:
+                continue
+            chunk = pd.read_csv(io.BytesIO(b''.join(lines)), sep='\t', header=None, names=TRADE_COLUMNS,
+                                dtype=str, encoding='utf-8')
+
+            raw = chunk.copy()
+            failed = {}
+            for column in DATE_COLUMNS:
+                if column not in date_formats and raw[column].notna().any():
+                    date_formats[column] = infer_date_format(raw[column].dropna().iloc[0])
+                chunk[column], failed[column] = parse_dates(raw[column], date_formats.get(column))
+            for column in PRICE_COLUMNS:
+                chunk[column] = pd.to_numeric(raw[column], errors='coerce').astype(np.float64)
+                failed[column] = chunk[column].isna().to_numpy()
+            if bad_lines is not None:
+                report_bad_values(raw, line_numbers, failed, bad_lines)
+            yield chunk
+
+
+def report_bad_values(raw, line_numbers, failed, bad_lines):
+    """ 把含无法解析的值（日期保留原文、价格记为 NaN）的行以行号和原文记录到 bad_lines """
+    bad_rows = np.flatnonzero(np.logical_or.reduce(list(failed.values())))
+    for row in bad_rows:
+        fields = [f"{column}={raw[column].iloc[row] if pd.notna(raw[column].iloc[row]) else '空'}"
+                  for column in TRADE_COLUMNS if failed[column][row]]
+        bad_lines.add(f"行 {line_numbers[row]}，无法解析: {', '.join(fields)}")
+
+
+def segment_starts(is_long, reverse_count=REVERSE_COUNT):
+    """ 震荡过滤分段，返回每段第一笔交易的下标
+
+    主方向为第一笔交易的方向；连续出现 reverse_count 笔反向单时，从第一笔反向单开始新段，
+    主方向随之切换；不足 reverse_count 笔的反向单归入当前段。
+
+    对方向序列做游程编码：只有长度 >= reverse_count 的游程（以及第一个游程）能确定主方向，
+    它们中方向与前一个不同的游程就是新段的起点。
+
+    Args:
+        is_long: 每笔交易是否为多单 (bool 数组)
+        reverse_count: 切换主方向需要的连续反向单笔数
+    Returns:
+        各段起点下标 (np.int64)，第一个元素为 0
+    """
+    is_long = np.asarray(is_long, dtype=bool)
+    if len(is_long) == 0:
+        return np.zeros(0, dtype=np.int64)
+    run_starts = np.flatnonzero(np.concatenate(([True], is_long[1:] != is_long[:-1])))
+    run_lengths = np.diff(np.append(run_starts, len(is_long)))
+    # 第一个游程和足够长的游程决定主方向
+    anchors = run_starts[(run_lengths >= reverse_count) | (run_starts == 0)]
+    anchor_long = is_long[anchors]
+    is_new = np.concatenate(([True], anchor_long[1:] != anchor_long[:-1]))
+    return anchors[is_new]
+
+
+def analyze_trades(file_path, chunksize=CHUNK_SIZE, reverse_count=REVERSE_COUNT):
+    # 分块读取txt文件，每块只保留分段统计需要的列
+    bad_lines = BadLines()
+    try:
+        chunks = [chunk[['进场日期', '出场日期', '进场价格', '单笔盈亏']]
+                  for chunk in read_trades(file_path, chunksize, bad_lines)]
     except Exception as e:
         print(f"读取文件时出错: {e}")
         return None
+    bad_lines.report()
 
-    # 确保数据类型正确
-    df['进场价格'] = pd.to_numeric(df['进场价格'], errors='coerce')
-    df['出场价格'] = pd.to_numeric(df['出场价格'], errors='coerce')
-    df['单笔盈亏'] = pd.to_numeric(df['单笔盈亏'], errors='coerce')
-
-    # 添加交易方向列
-    df['交易方向'] = np.where(df['进场价格'] > 0, '多', '空')
-
-    # 改进后的震荡过滤逻辑（带详细注释）
-    direction_series = df['交易方向'].values
-    group_ids = []
-    current_group = 0
-    main_direction = direction_series[0] if len(direction_series) > 0 else None
-    reverse_count = 0
-    reverse_indices = []
-
-    for i, d in enumerate(direction_series):
-        if d == main_direction:
-            reverse_count = 0
-            reverse_indices = []
-            group_ids.append(current_group)
-        else:
-            reverse_count += 1
-            reverse_indices.append(i)
-            group_ids.append(current_group)
-            if reverse_count == 3:
-                # 从第一次反向单开始新段
-                for j in range(reverse_indices[0], i+1):
-                    group_ids[j] = current_group + 1
-                current_group += 1
-                main_direction = direction_series[reverse_indices[0]]
-                reverse_count = 0
-                reverse_indices = []
-
-    # 如果最后还有未切分的，全部归入最后一段
-    if reverse_indices and len(reverse_indices) < 3:
-        for j in range(reverse_indices[0], len(direction_series)):
-            group_ids[j] = current_group
-        for j in range(i+1, len(direction_series)):
-            group_ids[j] = current_group
-
-    
-    df['段落ID'] = group_ids
-
-    # 分析结果
-    results = []
-
-    # 按段分组计算
-    for segment_id, segment in df.groupby('段落ID'):
-        direction = segment['交易方向'].iloc[0]
-        total_profit = segment['单笔盈亏'].sum()
-        win_count = len(segment[segment['单笔盈亏'] > 0])
-        lose_count = len(segment[segment['单笔盈亏'] < 0])
-
-        start_date = segment['进场日期'].iloc[0]
-        end_date = segment['出场日期'].iloc[-1]
-
-        result = {
-            '段号': segment_id,
-            '交易方向': direction,
-            '开始日期': start_date,
-            '结束日期': end_date,
-            '交易笔数': len(segment),
-            '盈利笔数': win_count,
-            '亏损笔数': lose_count,
-            '总盈亏': total_profit,
-            '结果': '胜' if total_profit > 0 else '负'
-        }
-        results.append(result)
-
-    return pd.DataFrame(results)
+    # 创建DataFrame
+    if not chunks or sum(len(chunk) for chunk in chunks) == 0:
+        print("没有找到有效数据行")
+        return None
+    df = pd.concat(chunks, ignore_index=True)
+    del chunks
+
+    is_long = (df['进场价格'] > 0).to_numpy()
+    starts = segment_starts(is_long, reverse_count)
+    ends = np.append(starts[1:], len(df))
+
+    # 按段汇总：每个统计量一次 reduceat，不再逐段过滤
+    profit = df['单笔盈亏'].to_numpy()
+    # 顺序累加的舍入误差会让盈亏正好抵消的段变成 ±1e-16，影响胜负判断，保留 8 位小数
+    total_profit = np.round(np.add.reduceat(np.nan_to_num(profit), starts), 8)
+    win_count = np.add.reduceat((profit > 0).astype(np.int64), starts)
+    lose_count = np.add.reduceat((profit < 0).astype(np.int64), starts)
+
+    return pd.DataFrame({
+        '段号': np.arange(len(starts)),
+        '交易方向': np.where(is_long[starts], '多', '空'),
+        '开始日期': df['进场日期'].to_numpy()[starts],
+        '结束日期': df['出场日期'].to_numpy()[ends - 1],
+        '交易笔数': ends - starts,
+        '盈利笔数': win_count,
+        '亏损笔数': lose_count,
+        '总盈亏': total_profit,
+        '结果': np.where(total_profit > 0, '胜', '负')
+    })
 
 
 def main():
@@ -118,12 +208,11 @@ def main():
 
     if results is not None:
         # 获取胜负序列
-        win_lose_sequence = ''.join(results['结果'].tolist())
+        is_win = (results['结果'] == '胜').to_numpy()
 
-        # 输出胜负序列到文本文件
-        sequence_file = file_path.rsplit('.', 1)[0] + '_win_lose_seq.txt'
-        with open(sequence_file, 'w', encoding='utf-8') as f:
-            f.write(win_lose_sequence)
+        # 输出胜负序列到位压缩文件，每个结果 1 bit
+        sequence_file = file_path.rsplit('.', 1)[0] + '_win_lose_seq.bin'
+        write_packed(sequence_file, is_win)
         print(f"\n胜负序列已保存至: {sequence_file}")
 
         # 保存详细结果到CSV
@@ -0,0 +1,52 @@
+import numpy as np
+
+
+def longest_run(flags):
+    """ 布尔数组中最长的连续 True 段长度 """
+    flags = np.concatenate(([False], np.asarray(flags, dtype=bool), [False]))
+    edges = np.flatnonzero(flags[1:] != flags[:-1])
+    return int((edges[1::2] - edges[0::2]).max()) if len(edges) else 0
+
+
+def compute_metrics(profits, mask=None, is_win=None):
+    """
+    回测统计：对选中的段一次计算全部指标，新增策略只需要给出自己的选择掩码
+
+    参数:
+    profits: 每段盈亏
+    mask: 策略选中的段 (布尔数组)，None 为全部跟单
+    is_win: 每段是否为胜，None 时按盈亏 > 0 判断
+
+    返回:
+    dict: 交易段数、胜利段数、亏损段数、胜率 (0~1)、赔率、胜中位数、负中位数、最大连败、总盈利、
+          权益曲线 (累计盈亏)、最大回撤、最长回撤段数 (权益低于前高的最长连续段数)
+    """
+    profits = np.asarray(profits, dtype=np.float64)
+    is_win = profits > 0 if is_win is None else np.asarray(is_win, dtype=bool)
+    if mask is not None:
+        mask = np.asarray(mask, dtype=bool)
+        profits, is_win = profits[mask], is_win[mask]
+
+    total = len(profits)
+    win_profits = profits[is_win]
+    lose_profits = profits[~is_win]
+    win_sum = win_profits.sum()
+    lose_sum = lose_profits.sum()
+
+    equity = np.cumsum(profits)
+    drawdown = np.maximum.accumulate(np.concatenate(([0.0], equity)))[1:] - equity
+
+    return {
+        '交易段数': total,
+        '胜利段数': len(win_profits),
+        '亏损段数': len(lose_profits),
+        '胜率': len(win_profits) / total if total > 0 else 0,
+        '赔率': win_sum / abs(lose_sum) if lose_sum != 0 else np.nan,
+        '胜中位数': np.median(win_profits) if len(win_profits) > 0 else np.nan,
+        '负中位数': np.median(lose_profits) if len(lose_profits) > 0 else np.nan,
+        '最大连败': longest_run(~is_win),
+        '总盈利': equity[-1] if total > 0 else 0,
+        '权益曲线': equity,
+        '最大回撤': drawdown.max() if total > 0 else 0,
+        '最长回撤段数': longest_run(drawdown > 0),
+    }
@@ -0,0 +1,83 @@
+import numpy as np
+
+# 位压缩胜负序列文件：16 字节文件头 + 每个结果 1 bit (胜为 1，小端位序)
+# 文本格式每个 '胜'/'负' 占 3 字节 (UTF-8)，压缩后为 1/24
+SEQ_MAGIC = b'WLSQ'
+SEQ_VERSION = 1
+HEADER_DTYPE = np.dtype([('magic', 'S4'), ('version', '<u2'), ('reserved', '<u2'), ('count', '<u8')])
+
+WIN_CODE = ord('胜')
+LOSE_CODE = ord('负')
+
+
+def text_to_bits(win_lose_sequence):
+    """ '胜'/'负' 字符串 -> 布尔数组 (胜为 True)，忽略其它字符 """
+    codes = np.frombuffer(win_lose_sequence.encode('utf-32-le'), dtype=np.uint32)
+    codes = codes[(codes == WIN_CODE) | (codes == LOSE_CODE)]
+    return codes == WIN_CODE
+
+
+def bits_to_text(is_win):
+    """ 布尔数组 -> '胜'/'负' 字符串 """
+    codes = np.where(np.asarray(is_win, dtype=bool), WIN_CODE, LOSE_CODE).astype('<u4')
+    return codes.tobytes().decode('utf-32-le')
+
+
+def write_packed(file_path, is_win):
+    """ 把胜负序列写成位压缩格式 """
+    is_win = np.asarray(is_win, dtype=bool)
+    header = np.zeros(1, dtype=HEADER_DTYPE)
+    header['magic'] = SEQ_MAGIC
+    header['version'] = SEQ_VERSION
+    header['count'] = len(is_win)
+    with open(file_path, 'wb') as f:
+        f.write(header.tobytes())
+        f.write(np.packbits(is_win, bitorder='little').tobytes())
+
+
+def is_packed(file_path):
+    with open(file_path, 'rb') as f:
+        return f.read(len(SEQ_MAGIC)) == SEQ_MAGIC
+
+
+def read_packed(file_path):
+    """
+    读取位压缩文件
+
+    返回:
+    (packed, count): packed 为 uint8 数组，count 为结果个数
+    """
+    header = np.fromfile(file_path, dtype=HEADER_DTYPE, count=1)
+    if len(header) == 0 or header['magic'][0] != SEQ_MAGIC:
+        raise ValueError(f"{file_path} 不是位压缩胜负序列文件")
+    if header['version'][0] != SEQ_VERSION:
+        raise ValueError(f"{file_path} 版本 {header['version'][0]} 不支持")
+    count = int(header['count'][0])
+    nbytes = (count + 7) // 8
+    packed = np.fromfile(file_path, dtype=np.uint8, count=nbytes, offset=HEADER_DTYPE.itemsize)
+    if len(packed) < nbytes:
+        raise ValueError(f"{file_path} 数据不完整")
+    return packed, count
+
+
+def read_win_lose(file_path):
+    """ 读取胜负序列，自动识别位压缩格式和文本格式，返回布尔数组 (胜为 True) """
+    if is_packed(file_path):
+        packed, count = read_packed(file_path)
+        return np.unpackbits(packed, count=count, bitorder='little').view(bool)
+    with open(file_path, 'r', encoding='utf-8') as f:
+        return text_to_bits(f.read())
+
+
+def loss_runs(is_win):
+    """
+    每段连败的起点、长度，以及该段之后是否紧跟一次胜利（否则是序列结尾）
+
+    返回:
+    (starts, lengths, closed): 三个等长数组
+    """
+    is_win = np.asarray(is_win, dtype=bool)
+    is_loss = np.concatenate(([False], ~is_win, [False]))
+    edges = np.flatnonzero(is_loss[1:] != is_loss[:-1])
+    starts, ends = edges[0::2], edges[1::2]
+    return starts, ends - starts, ends < len(is_win)
@@ -0,0 +1,94 @@
+import queue
+import socket
+import threading
+import time
+
+from stock_alert_parser import send_notification, format_alert_message
+
+
+def desktop_sink(title, message):
+    send_notification(title=title, message=message, app_name='ssviewer', timeout=10)
+
+
+class FileSink:
+    """把通知追加写入文本文件，便于在无桌面的 Linux 上测试"""
+    def __init__(self, path):
+        self.path = path
+
+    def __call__(self, title, message):
+        with open(self.path, 'a', encoding='utf-8') as f:
+            f.write(f"{time.strftime('%Y-%m-%d %H:%M:%S')} {title}: {message.replace(chr(10), ' | ')}\n")
+
+
+class SocketSink:
+    """把通知以数据报发送到本地 socket，address 为字符串时使用 unix socket，否则为 (host, port)"""
+    def __init__(self, address):
+        self.address = address
+        family = socket.AF_UNIX if isinstance(address, str) else socket.AF_INET
+        self.sock = socket.socket(family, socket.SOCK_DGRAM)
+
+    def __call__(self, title, message):
+        self.sock.sendto(f'{title}\n{message}'.encode('utf-8'), self.address)
+
+
+class NotificationDispatcher:
+    """后台通知分发：取数/渲染循环只把预警放进队列，由工作线程发送通知
+
+    工作线程每次取出队列里已积压的全部批次合并成一条通知，
+    同一预警在 dedup_interval 秒内重复出现只发送一次。
+    发送失败的提示交给 log 输出，默认 print。
+    """
+    def __init__(self, sink=desktop_sink, title='ALERT ONCE', dedup_interval=60.0, log=print):
+        self.sink = sink
+        self.log = log
+        self.title = title
+        self.dedup_interval = dedup_interval
+        self.queue = queue.Queue()
+        self.last_sent = {}  # (代码, 预警价格) -> 上次发送时间
+        self.thread = threading.Thread(target=self.run, name='notification-dispatcher', daemon=True)
+        self.thread.start()
+
+    def submit(self, alerts):
+        """提交一个 tick 的预警，立即返回"""
+        if alerts:
+            self.queue.put(list(alerts))
+
+    def run(self):
+        stop = False
+        while not stop:
+            batch = self.queue.get()
+            if batch is None:
+                break
+            # 合并已经排队的其它批次
+            while True:
+                try:
+                    more = self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                if more is None:
+                    stop = True
+                    break
+                batch += more
+            batch = self.dedup(batch)
+            if batch:
+                try:
+                    self.sink(self.title, format_alert_message(batch))
+                except Exception as e:
+                    self.log(f"Notification failed: {e}")
+
+    def dedup(self, alerts):
+        now = time.monotonic()
+        result = []
+        for alert in alerts:
+            key = (alert.stock_code, alert.price)
+            last = self.last_sent.get(key)
+            if last is not None and now - last < self.dedup_interval:
+                continue
+            self.last_sent[key] = now
+            result.append(alert)
+        return result
+
+    def close(self, timeout=5.0):
+        """发送完队列中剩余的通知后停止工作线程"""
+        self.queue.put(None)
+        self.thread.join(timeout)
@@ -0,0 +1,76 @@
+import numpy as np
+
+
+def normalize_weights(members):
+    """ portfolio.json 的一个组合 -> {代码: 权重}，权重之和为 1
+
+    members 可以是代码列表（等权），也可以是 {代码: 权重} 字典（按配置加权）
+    """
+    if isinstance(members, dict):
+        weights = {code: float(weight) for code, weight in members.items()}
+    else:
+        weights = dict.fromkeys(members, 1.0)
+    total = sum(weights.values())
+    if total <= 0:
+        raise ValueError(f'portfolio weights must sum to a positive value: {members}')
+    return {code: weight / total for code, weight in weights.items()}
+
+
+class PortfolioMatrix(object):
+    """ 组合成分在启动时编译成 代码 × 组合 的稀疏权重矩阵 (COO 三元组)
+
+    每个 tick 用一次稀疏矩阵-向量乘积 (np.bincount) 算出全部组合的加权涨跌幅，
+    组合之间可以有重叠的成分股。缺少报价 (NaN) 的成分股被屏蔽，剩余成分按权重重新归一。
+
+    Attributes:
+        names: 列号 -> 组合名
+        rows: 每个非零元素的代码 id (SymbolRegistry 的 id)
+        cols: 每个非零元素的组合列号
+        weights: 每个非零元素的权重，每列之和为 1
+    """
+    def __init__(self, portfolios, registry):
+        self.names = list(portfolios)
+        rows, cols, weights = [], [], []
+        for col, name in enumerate(self.names):
+            for code, weight in normalize_weights(portfolios[name]).items():
+                rows.append(registry.intern(code))
+                cols.append(col)
+                weights.append(weight)
+        self.rows = np.array(rows, dtype=np.int64)
+        self.cols = np.array(cols, dtype=np.int64)
+        self.weights = np.array(weights, dtype=np.float64)
+
+    def __len__(self):
+        return len(self.names)
+
+    def member_ids(self):
+        """ 全部组合成分股 id 的并集 """
+        return np.unique(self.rows)
+
+    def aggregate(self, values):
+        """ 按权重汇总每个组合
+
+        Args:
+            values: 按代码 id 排列的向量，缺失为 NaN
+        Returns:
+            (result, valid): result 为每个组合的加权值，valid 为每个组合有报价的成分数；
+            没有任何有效成分的组合 result 为 NaN
+        """
+        member_values = values[self.rows]
+        mask = ~np.isnan(member_values)
+        masked_weights = np.where(mask, self.weights, 0.0)
+        n = len(self.names)
+        total = np.bincount(self.cols, weights=masked_weights * np.where(mask, member_values, 0.0), minlength=n)
+        weight_sum = np.bincount(self.cols, weights=masked_weights, minlength=n)
+        valid = np.bincount(self.cols, weights=mask, minlength=n).astype(np.int64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            result = np.where(valid > 0, total / weight_sum, np.nan)
+        return result, valid
+
+    def latest(self, values):
+        """ 每个组合成分中的最大值（用于取最新报价时间），没有有效成分时为 NaN """
+        member_values = values[self.rows]
+        result = np.full(len(self.names), -np.inf)
+        np.maximum.at(result, self.cols, np.where(np.isnan(member_values), -np.inf, member_values))
+        result[np.isneginf(result)] = np.nan
+        return result
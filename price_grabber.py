@@ -1,51 +1,237 @@
 import requests
 import os
+import time
+from datetime import datetime
 import easyquotation
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from requests.adapters import HTTPAdapter
+from easyquotation.helpers import get_stock_type
 # os.environ['NO_PROXY'] = 'hq.sinajs.cn'
 
+
+class QuoteRecord(object):
+    """ numeric quote of one code, strings are only produced by format() when rendering
+
+    Attributes:
+        code: requested code, e.g. '600000' or 'sh000001'
+        name: stock name
+        price: current price
+        prev_close: close price of last trading day
+        high, low: today high / low price
+        ratio: change ratio in percent
+        timestamp: quote time, seconds since epoch
+    """
+    __slots__ = ('code', 'name', 'price', 'prev_close', 'high', 'low', 'ratio', 'timestamp')
+
+    def __init__(self, code, name, price, prev_close, high, low, ratio, timestamp):
+        self.code = code
+        self.name = name
+        self.price = price
+        self.prev_close = prev_close
+        self.high = high
+        self.low = low
+        self.ratio = ratio
+        self.timestamp = timestamp
+
+    def high_ratio(self):
+        return (self.high - self.prev_close) / self.prev_close * 100.0
+
+    def low_ratio(self):
+        return (self.low - self.prev_close) / self.prev_close * 100.0
+
+    def price_str(self):
+        if self.code[-6] in ['5', '1']:
+            return '%.3f' % self.price
+        return '%.2f' % self.price
+
+    def time_str(self):
+        return time.strftime('%H:%M:%S', time.localtime(self.timestamp))
+
+    def format(self):
+        """ same string fields as Price_Grabber.parse_dict results """
+        local_time = time.localtime(self.timestamp)
+        return dict(stock_name=self.name, ratio='%.2f%%' % self.ratio, current_price=self.price_str(),
+                    today_high='%.2f%%' % self.high_ratio(), today_low='%.2f%%' % self.low_ratio(),
+                    current_date=time.strftime('%Y-%m-%d', local_time),
+                    current_time=time.strftime('%H:%M:%S', local_time))
+
+
 class Price_Grabber(object):
-    def __init__(self):
+    def __init__(self, concurrent=False, workers=8, batch_size=None, batch_timeout=3.0, recorder=None, log=print):
+        """
+        Args:
+            concurrent: split codes into batches and fetch them in parallel over a keep-alive connection pool
+            workers: number of fetch threads (and pooled connections) in concurrent mode
+            batch_size: codes per upstream request, defaults to the interface limit (tencent: 60)
+            batch_timeout: deadline in seconds for all batches of one call, batches not finished by then are
+                dropped from the tick (also used as the socket timeout of each request)
+            recorder: optional TickRecorder, every result of grab_records / grab_registry is appended to it
+            log: print-like function for failed batches, e.g. DiffRenderer.status in --diff mode
+        """
         self.interface_name = 'tencent'
         self.quotation = easyquotation.use(self.interface_name)  # 新浪 ['sina'] 腾讯 ['tencent', 'qq', 'hkquote']
         # self.interface_url = 'http://hq.sinajs.cn/list='
+        self.concurrent = concurrent
+        self.batch_size = batch_size or self.quotation.max_num
+        self.batch_timeout = batch_timeout
+        self.executor = None
+        self.recorder = recorder
+        self.log = log
+        self.last_fetch_time = 0.0  # seconds spent in the last real() call (request and easyquotation parsing)
+        self.last_parse_time = 0.0  # seconds spent building QuoteRecords in the last grab_registry
+        if concurrent:
+            # 线程池和连接池常驻，避免每次 grab 重新建线程、重新握手
+            self.session = requests.Session()
+            adapter = HTTPAdapter(pool_connections=1, pool_maxsize=workers)
+            self.session.mount('http://', adapter)
+            self.session.mount('https://', adapter)
+            self.executor = ThreadPoolExecutor(max_workers=workers)
+
+    def real(self, stocks_code, prefix=False):
+        """ same as easyquotation real(), batches are fetched concurrently in concurrent mode
+
+        the time spent in this call is kept in last_fetch_time
+        """
+        t_start = time.perf_counter()
+        try:
+            if not self.concurrent:
+                return self.quotation.real(stocks_code, prefix=prefix)
+            market_codes = [self.market_code(code) for code in stocks_code]
+            batches = [market_codes[i:i + self.batch_size] for i in range(0, len(market_codes), self.batch_size)]
+            futures = [self.executor.submit(self.fetch_batch, batch) for batch in batches]
+            # 按提交顺序收集，保证结果顺序与请求顺序一致
+            # 所有批次共用一个截止时间：socket 超时只限制单次读取，持续慢速返回的批次仍会拖住整个 tick
+            deadline = t_start + self.batch_timeout
+            texts = []
+            for batch, future in zip(batches, futures):
+                try:
+                    texts.append(future.result(timeout=max(deadline - time.perf_counter(), 0.0)))
+                except FutureTimeoutError:
+                    future.cancel()
+                    self.log(f'Batch fetch timed out ({batch[0]}..{batch[-1]}): {self.batch_timeout}s deadline')
+                except Exception as e:
+                    self.log(f'Batch fetch failed ({batch[0]}..{batch[-1]}): {e}')
+            return self.quotation.format_response_data(texts, prefix=prefix)
+        finally:
+            self.last_fetch_time = time.perf_counter() - t_start
+
+    def fetch_batch(self, market_codes):
+        url = self.quotation.stock_api + ','.join(market_codes)
+        r = self.session.get(url, headers=self.quotation._get_headers(), timeout=self.batch_timeout)
+        return r.text
+
+    def close(self):
+        if self.recorder is not None:
+            self.recorder.close()
+        if self.executor is not None:
+            self.executor.shutdown(wait=False)
+            self.session.close()
 
     def grab(self, stocks_code):
-        stocks_dict = self.quotation.real(stocks_code)
+        stocks_dict = self.real(stocks_code)
         # url = self.interface_url + stock_code
         # r = requests.get(url)
         return self.parse_dict(stocks_dict)
 
+    def grab_records(self, stocks_code):
+        """ fetch the union of all codes needed in one tick with a single request, as numeric QuoteRecord objects
+
+        Args:
+            stocks_code: codes from every section (stock list, index list, portfolios), duplicates allowed
+
+        Returns:
+            dict, requested code -> QuoteRecord, in request order, codes without data are left out
+        """
+        unique_codes = list(dict.fromkeys(stocks_code))
+        if not unique_codes:
+            return {}
+        # prefix=True 使返回结果以 sh/sz 开头作为键，避免 sh000001 与 000001 互相覆盖
+        stocks_dict = self.real(unique_codes, prefix=True)
+        records = {}
+        for code in unique_codes:
+            market_code = self.market_code(code)
+            if market_code in stocks_dict:
+                records[code] = self.parse_record(code, stocks_dict[market_code])
+        if self.recorder is not None:
+            self.recorder.record(records)
+        return records
+
+    def grab_registry(self, registry, ids=None):
+        """ fetch the symbols of a SymbolRegistry with one request
+
+        Args:
+            registry: SymbolRegistry
+            ids: symbol ids to fetch, default is every symbol
+
+        Returns:
+            list of QuoteRecord indexed by symbol id, None where not fetched or the upstream returned no data
+        """
+        t_start = time.perf_counter()
+        if ids is None:
+            ids = range(len(registry))
+        ids = [int(code_id) for code_id in ids]
+        self.last_fetch_time = 0.0
+        stocks_dict = self.real([registry.market_codes[code_id] for code_id in ids], prefix=True) if ids else {}
+        records = [None] * len(registry)
+        for code_id in ids:
+            single_stock_dict = stocks_dict.get(registry.market_codes[code_id])
+            if single_stock_dict is not None:
+                records[code_id] = self.parse_record(registry.codes[code_id], single_stock_dict)
+                if registry.names[code_id] is None:
+                    registry.names[code_id] = single_stock_dict['name']
+        self.last_parse_time = time.perf_counter() - t_start - self.last_fetch_time
+        if self.recorder is not None:
+            self.recorder.record({rec.code: rec for rec in records if rec is not None})
+        return records
+
+    def parse_record(self, code, single_stock_dict):
+        prev_close = single_stock_dict['close']
+        if self.interface_name == 'tencent':
+            ratio = single_stock_dict['涨跌(%)']
+            quote_time = single_stock_dict['datetime']
+        else:
+            ratio = (single_stock_dict['now'] - prev_close) / prev_close * 100.0
+            quote_time = datetime.strptime(single_stock_dict['date'] + ' ' + single_stock_dict['time'],
+                                           '%Y-%m-%d %H:%M:%S')
+        return QuoteRecord(code, single_stock_dict['name'], single_stock_dict['now'], prev_close,
+                           single_stock_dict['high'], single_stock_dict['low'], ratio, quote_time.timestamp())
+
+    @staticmethod
+    def market_code(code):
+        return get_stock_type(code) + code[-6:]
+
     def parse_dict(self, stocks_dict):
         # print(stocks_dict)
         res_dicts = []
         for code in stocks_dict:
-            single_stock_dict = stocks_dict[code]
-            stock_name = single_stock_dict['name']
-            if code[0] in ['5', '1']:
-                price_s = '%.3f' % single_stock_dict['now']
-            else:
-                price_s = '%.2f' % single_stock_dict['now']
-            if self.interface_name == 'tencent':
-                ratio_s = '%.2f%%' % single_stock_dict['涨跌(%)']
-            else:
-                ratio_f = (single_stock_dict['now'] - single_stock_dict['close']) / single_stock_dict['close'] * 100.0
-                ratio_s = '%.2f%%' % ratio_f
-            high_ratio = (single_stock_dict['high'] - single_stock_dict['close']) / single_stock_dict['close'] * 100.0
-            high_ratio_s = '%.2f%%' % high_ratio
-            low_ratio = (single_stock_dict['low'] - single_stock_dict['close']) / single_stock_dict['close'] * 100.0
-            low_ratio_s = '%.2f%%' % low_ratio
-            if self.interface_name == 'tencent':
-                current_date = str(single_stock_dict['datetime'].date())
-                current_time = str(single_stock_dict['datetime'].time())
-            else:
-                current_date = single_stock_dict['date']
-                current_time = single_stock_dict['time']
-            res_dict = dict(stock_name=stock_name, ratio=ratio_s, current_price=price_s,
-                            today_high=high_ratio_s, today_low=low_ratio_s,
-                            current_date=current_date, current_time=current_time)
-            res_dicts.append(res_dict)
+            res_dicts.append(self.parse_single(code, stocks_dict[code]))
         return res_dicts
 
+    def parse_single(self, code, single_stock_dict):
+        stock_name = single_stock_dict['name']
+        if code[-6] in ['5', '1']:
+            price_s = '%.3f' % single_stock_dict['now']
+        else:
+            price_s = '%.2f' % single_stock_dict['now']
+        if self.interface_name == 'tencent':
+            ratio_s = '%.2f%%' % single_stock_dict['涨跌(%)']
+        else:
+            ratio_f = (single_stock_dict['now'] - single_stock_dict['close']) / single_stock_dict['close'] * 100.0
+            ratio_s = '%.2f%%' % ratio_f
+        high_ratio = (single_stock_dict['high'] - single_stock_dict['close']) / single_stock_dict['close'] * 100.0
+        high_ratio_s = '%.2f%%' % high_ratio
+        low_ratio = (single_stock_dict['low'] - single_stock_dict['close']) / single_stock_dict['close'] * 100.0
+        low_ratio_s = '%.2f%%' % low_ratio
+        if self.interface_name == 'tencent':
+            current_date = str(single_stock_dict['datetime'].date())
+            current_time = str(single_stock_dict['datetime'].time())
+        else:
+            current_date = single_stock_dict['date']
+            current_time = single_stock_dict['time']
+        return dict(stock_name=stock_name, ratio=ratio_s, current_price=price_s,
+                    today_high=high_ratio_s, today_low=low_ratio_s,
+                    current_date=current_date, current_time=current_time)
+
     def parse_text(self, text: str):
         try:
             left_start_idx = text.index('="') + 2
@@ -1,11 +1,52 @@
 from price_grabber import Price_Grabber
 from prettytable import PrettyTable
 import time
-from time_domain_list import TimeDomainList
+import argparse
+import atexit
+import numpy as np
+from tick_store import TickStore
+from symbol_registry import SymbolRegistry
+from tick_scheduler import TickScheduler
+from table_renderer import DiffRenderer
+from tick_recorder import TickRecorder
+from replay_grabber import ReplayGrabber
 
 
 if __name__ == '__main__':
-    pg = Price_Grabber()
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--diff', action='store_true',
+                            help='incremental redraw, only changed cells are written (ANSI terminal)')
+    arg_parser.add_argument('--record', default=None, metavar='DIR',
+                            help='append every fetched tick to a per-day binary file in DIR')
+    arg_parser.add_argument('--replay', default=None, metavar='DIR',
+                            help='replay ticks recorded with --record from DIR instead of fetching live quotes')
+    arg_parser.add_argument('--replay-day', default=None, metavar='YYYYMMDD',
+                            help='replay a single day, default is every recorded day in order')
+    arg_parser.add_argument('--speed', type=float, default=1.0,
+                            help='replay speed, 1 is real time, N is N times faster, 0 is as fast as possible')
+    arg_parser.add_argument('--index-interval', type=float, default=4.5, help='refresh period of indices, seconds')
+    arg_parser.add_argument('--stock-interval', type=float, default=4.5, help='refresh period of stocks, seconds')
+    arg_parser.add_argument('--all-day', action='store_true', help='keep polling outside SH/SZ trading sessions')
+    arg_parser.add_argument('--concurrent', action='store_true',
+                            help='fetch quotes in parallel batches over a keep-alive connection pool')
+    arg_parser.add_argument('--workers', type=int, default=8, help='fetch threads in --concurrent mode')
+    arg_parser.add_argument('--batch-timeout', type=float, default=3.0,
+                            help='deadline in seconds for all batches of one tick in --concurrent mode')
+    args = arg_parser.parse_args()
+    renderer = DiffRenderer() if args.diff else None
+    if renderer is not None:
+        # 增量渲染隐藏了光标，任何方式退出（Ctrl+C、回放结束）都要恢复
+        atexit.register(renderer.close)
+    # 增量渲染时提示信息写到状态行，直接 print 会落在光标停留处打乱帧
+    log = renderer.status if renderer is not None else print
+
+    if args.replay:
+        pg = ReplayGrabber(args.replay, day=args.replay_day, speed=args.speed, log=log)
+    else:
+        recorder = TickRecorder(args.record) if args.record else None
+        pg = Price_Grabber(concurrent=args.concurrent, workers=args.workers, batch_timeout=args.batch_timeout,
+                           recorder=recorder, log=log)
+    atexit.register(pg.close)
     stock_list = []
     with open('stock_list.txt', 'r') as f:
         lines = f.readlines()
@@ -22,71 +63,71 @@ if __name__ == '__main__':
             index_code = line
             index_list.append(index_code)
 
-    stock_tdl = []
-    for stock_code in stock_list:
-        tdl = TimeDomainList(element_cnt=10)
-        stock_tdl.append(tdl)
-    index_tdl = []
-    for index_code in index_list:
-        tdl = TimeDomainList(element_cnt=10)
-        index_tdl.append(tdl)
+    # 代码表在启动时建立一次，取数、TickStore 和渲染都以 id 为下标
+    registry = SymbolRegistry(stock_list + index_list)
+    stock_ids = registry.id_array(stock_list)
+    index_ids = registry.id_array(index_list)
+    tick_store = TickStore(len(registry), element_cnt=10)
     main_table = PrettyTable(['volatility', 'stock_code', ' stock_name ', ' price ', ' ratio ',
                               'today_low', 'today_high', 'time', 'ratio_f'])
+    display_fields = ['volatility', 'stock_code', ' stock_name ', ' price ', ' ratio ',
+                      'today_low', 'today_high', 'time']
+
+    fetch_groups = {'index': index_ids, 'stock': stock_ids}
+    scheduler = TickScheduler({'index': args.index_interval, 'stock': args.stock_interval},
+                              market_hours=not args.all_day, log=log)
+    records = [None] * len(registry)  # 每个 id 最近一次取到的报价
 
     while 1:
+        # 回放时由 ReplayGrabber 控制节奏，每个 tick 取全部分组
+        due = list(fetch_groups) if args.replay else scheduler.wait()
+        due_ids = np.unique(np.concatenate([fetch_groups[group] for group in due]))
+        fetched = pg.grab_registry(registry, due_ids)
+        ratios = np.full(len(registry), np.nan)  # 只有本 tick 取到的代码才 push
+        for code_id in due_ids:
+            rec = fetched[code_id]
+            if rec is not None:
+                records[code_id] = rec
+                ratios[code_id] = rec.ratio
+        tick_store.push(ratios)
+        volatility = tick_store.volatility()
+
         stock_table = main_table[:]
-        res_list = pg.grab(stock_list)
-        for i, res in enumerate(res_list):
-            ratio = '-100.00%'
-            rf = -100.0
+        for i, code_id in enumerate(stock_ids):
             stock_code = stock_list[i]
-            # res = pg.grab(stock_code)
-            try:
-                ratio = res['ratio']
-                rf = float(ratio[:-1])
-                stock_tdl[i].push(rf)
-            except:
-                print('Wrong value')
+            rec = records[code_id]
+            if rec is None:
+                log('No data:', stock_code)
+                continue
             volatility_s = ''
-            if stock_tdl[i].list[0] is not None:
-                volatility_ratio = stock_tdl[i].list[-1] - stock_tdl[i].list[0]
-                if volatility_ratio > 0:
-                    volatility_ratio = stock_tdl[i].list[-1] - min(stock_tdl[i].list)
-                else:
-                    volatility_ratio = stock_tdl[i].list[-1] - max(stock_tdl[i].list)
-                volatility_s = "%.2f%%" % volatility_ratio
+            if not np.isnan(volatility[code_id]):
+                volatility_s = "%.2f%%" % volatility[code_id]
 
-            stock_table.add_row([volatility_s, stock_code, res['stock_name'],
-                                res['current_price'], ratio,
-                                res['today_low'], res['today_high'], res['current_time'], rf])
+            stock_table.add_row([volatility_s, stock_code, registry.names[code_id],
+                                registry.price_formats[code_id] % rec.price, '%.2f%%' % rec.ratio,
+                                '%.2f%%' % rec.low_ratio(), '%.2f%%' % rec.high_ratio(), rec.time_str(), rec.ratio])
         index_table = main_table[:]
 
-        res_list = pg.grab(index_list)
-        for i, res in enumerate(res_list):
-            # res = pg.grab(index_code)
+        for i, code_id in enumerate(index_ids):
             index_code = index_list[i]
-            try:
-                index_tdl[i].push(float(res['ratio'][:-1]))
-            except:
-                print('Wrong value')
+            rec = records[code_id]
+            if rec is None:
+                log('No data:', index_code)
+                continue
             volatility_s = ''
-            if index_tdl[i].list[0] is not None:
-                volatility_ratio = index_tdl[i].list[-1] - index_tdl[i].list[0]
-                if volatility_ratio > 0:
-                    volatility_ratio = index_tdl[i].list[-1] - min(index_tdl[i].list)
-                else:
-                    volatility_ratio = index_tdl[i].list[-1] - max(index_tdl[i].list)
-                volatility_s = "%.2f%%" % volatility_ratio
-            ratio = res['ratio']
-            rf = float(ratio[:-1])
-            index_table.add_row([volatility_s, index_code, res['stock_name'],
-                                res['current_price'], ratio,
-                                res['today_low'], res['today_high'], res['current_time'], rf])
-        print(time.strftime('%H:%M:%S', time.localtime(time.time())))
-        stock_table.align = "r"
-        index_table.align = "r"
-        print(index_table.get_string(fields=['volatility', 'stock_code', ' stock_name ', ' price ', ' ratio ',
-                              'today_low', 'today_high', 'time']))
-        print(stock_table.get_string(fields=['volatility', 'stock_code', ' stock_name ', ' price ', ' ratio ',
-                              'today_low', 'today_high', 'time'], sortby="ratio_f"))
-        time.sleep(4.5)
+            if not np.isnan(volatility[code_id]):
+                volatility_s = "%.2f%%" % volatility[code_id]
+            index_table.add_row([volatility_s, index_code, registry.names[code_id],
+                                registry.price_formats[code_id] % rec.price, '%.2f%%' % rec.ratio,
+                                '%.2f%%' % rec.low_ratio(), '%.2f%%' % rec.high_ratio(), rec.time_str(), rec.ratio])
+        title = time.strftime('%H:%M:%S', time.localtime(time.time()))
+        if renderer is not None:
+            stock_rows = sorted(stock_table.rows, key=lambda row: row[-1])
+            renderer.render(title, [(display_fields, [row[:-1] for row in index_table.rows]),
+                                    (display_fields, [row[:-1] for row in stock_rows])])
+        else:
+            print(title)
+            stock_table.align = "r"
+            index_table.align = "r"
+            print(index_table.get_string(fields=display_fields))
+            print(stock_table.get_string(fields=display_fields, sortby="ratio_f"))
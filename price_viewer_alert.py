@@ -2,9 +2,21 @@ from price_grabber import Price_Grabber
 from prettytable import PrettyTable
 import time
 import json
-from time_domain_list import TimeDomainList
-from stock_alert_parser import StockAlertParser, Alert
+import numpy as np
+from tick_store import TickStore
+from symbol_registry import SymbolRegistry
+from portfolio_matrix import PortfolioMatrix
+from tick_scheduler import TickScheduler
+from get_stock_names import StockNameResolver
+from stock_alert_parser import StockAlertParser
+from notification_dispatcher import NotificationDispatcher, FileSink, desktop_sink
+from table_renderer import DiffRenderer
+from tick_recorder import TickRecorder
+from replay_grabber import ReplayGrabber
+from stage_timer import StageTimer
 
+import argparse
+import atexit
 import signal
 import sys
 
@@ -43,6 +55,46 @@ NO_ALERT = False
 
 
 if __name__ == '__main__':
+    arg_parser = argparse.ArgumentParser()
+    arg_parser.add_argument('--diff', action='store_true',
+                            help='incremental redraw, only changed cells are written (ANSI terminal)')
+    arg_parser.add_argument('--record', default=None, metavar='DIR',
+                            help='append every fetched tick to a per-day binary file in DIR')
+    arg_parser.add_argument('--replay', default=None, metavar='DIR',
+                            help='replay ticks recorded with --record from DIR instead of fetching live quotes')
+    arg_parser.add_argument('--replay-day', default=None, metavar='YYYYMMDD',
+                            help='replay a single day, default is every recorded day in order')
+    arg_parser.add_argument('--speed', type=float, default=1.0,
+                            help='replay speed, 1 is real time, N is N times faster, 0 is as fast as possible')
+    arg_parser.add_argument('--notify-file', default=None,
+                            help='append notifications to this file instead of desktop notifications')
+    arg_parser.add_argument('--index-interval', type=float, default=2.5, help='refresh period of indices, seconds')
+    arg_parser.add_argument('--stock-interval', type=float, default=2.5,
+                            help='refresh period of the stock list and portfolio members, seconds')
+    arg_parser.add_argument('--all-day', action='store_true', help='keep polling outside SH/SZ trading sessions')
+    arg_parser.add_argument('--concurrent', action='store_true',
+                            help='fetch quotes in parallel batches over a keep-alive connection pool')
+    arg_parser.add_argument('--workers', type=int, default=8, help='fetch threads in --concurrent mode')
+    arg_parser.add_argument('--batch-timeout', type=float, default=3.0,
+                            help='deadline in seconds for all batches of one tick in --concurrent mode')
+    arg_parser.add_argument('--metrics-file', default=None, metavar='PATH',
+                            help='write rolling p50/p95/p99 of each tick stage to PATH every tick (Prometheus text format)')
+    arg_parser.add_argument('--status-line', action='store_true',
+                            help='append rolling p50/p95/p99 of each tick stage to the title line')
+    arg_parser.add_argument('--timing-window', type=int, default=1000,
+                            help='number of recent ticks used for the stage percentiles')
+    args = arg_parser.parse_args()
+    renderer = DiffRenderer() if args.diff else None
+    if renderer is not None:
+        # 增量渲染隐藏了光标，任何方式退出（Ctrl+C、回放结束）都要恢复
+        atexit.register(renderer.close)
+    # 增量渲染时提示信息写到状态行，直接 print 会落在光标停留处打乱帧
+    log = renderer.status if renderer is not None else print
+    # 通知在后台线程发送，不阻塞取数和渲染
+    dispatcher = NotificationDispatcher(sink=FileSink(args.notify_file) if args.notify_file else desktop_sink, log=log)
+    # 回放结束 (ReplayFinished) 等任何退出都先发完队列中的通知，否则后台线程随进程结束而丢弃它们
+    atexit.register(dispatcher.close)
+
     # 定义信号处理函数
     def signal_handler(sig, frame):
         print('You pressed Ctrl+C!')
@@ -52,7 +104,13 @@ if __name__ == '__main__':
     # 注册信号处理函数以捕捉 SIGINT
     signal.signal(signal.SIGINT, signal_handler)
 
-    pg = Price_Grabber()
+    if args.replay:
+        pg = ReplayGrabber(args.replay, day=args.replay_day, speed=args.speed, log=log)
+    else:
+        recorder = TickRecorder(args.record) if args.record else None
+        pg = Price_Grabber(concurrent=args.concurrent, workers=args.workers, batch_timeout=args.batch_timeout,
+                           recorder=recorder, log=log)
+    atexit.register(pg.close)
 
     # 解析 stock_list.txt 文件
     stock_parser = StockAlertParser('stock_list.txt')
@@ -67,116 +125,141 @@ if __name__ == '__main__':
     with open('portfolio.json', 'r') as f:
         portfolio = json.load(f)
 
-    # 使用 TimeDomainList 存储股价
-    stock_tdl = [TimeDomainList(element_cnt=20) for _ in stock_list]
-    index_tdl = [TimeDomainList(element_cnt=20) for _ in index_list]
+    # 启动时建立代码表，之后取数、TickStore、预警和渲染都以整数 id 为下标
+    # 每个 tick 只请求一次全部代码的并集，各表格和组合都从同一份快照取数据
+    registry = SymbolRegistry(stock_list + index_list)
+    stock_ids = registry.id_array(stock_list)
+    index_ids = registry.id_array(index_list)
+    # 组合编译成 代码 × 组合 的权重矩阵，portfolio.json 中可写代码列表（等权）或 {代码: 权重}
+    portfolio_matrix = PortfolioMatrix(portfolio, registry)
+    if not args.replay:
+        registry.resolve_names(StockNameResolver())
+    stock_alert_engine = stock_parser.compile(registry)
+    index_alert_engine = index_parser.compile(registry)
+
+    # 使用 TickStore 按列存储所有代码的涨跌幅，行号即 id，每个 tick 整体 push 一次
+    tick_store = TickStore(len(registry), element_cnt=20)
 
     main_table = PrettyTable(
         ['volatility', 'code', 'name', 'price', 'ratio', 'today_low', 'today_high', 'time', 'ratio_f'])
+    display_fields = ['volatility', 'code', 'name', 'price', 'ratio', 'today_low', 'today_high', 'time']
 
     # ANSI颜色代码 (cmd不适用，windows terminal可用)
     # YELLOW_BACKGROUND = "\033[43m"
     # RESET = "\033[0m"
 
+    # 按组设置刷新周期：指数一组，自选股和组合成分股一组
+    fetch_groups = {'index': index_ids,
+                    'stock': np.unique(np.concatenate([stock_ids, portfolio_matrix.member_ids()]))}
+    scheduler = TickScheduler({'index': args.index_interval, 'stock': args.stock_interval},
+                              market_hours=not args.all_day, log=log)
+    records = [None] * len(registry)  # 每个 id 最近一次取到的报价
+    # 各阶段耗时的滚动分位数
+    timer = StageTimer(window=args.timing_window)
+
     while True:
-        t_start = time.time()
+        # 回放时由 ReplayGrabber 控制节奏，每个 tick 取全部分组
+        due = list(fetch_groups) if args.replay else scheduler.wait()
+        t_start = time.perf_counter()
         stock_table = main_table[:]
         index_table = main_table[:]
 
+        # 到期的分组合并成一次请求，录制文件中也是一个完整的 tick
+        due_ids = np.unique(np.concatenate([fetch_groups[group] for group in due]))
+        fetched = pg.grab_registry(registry, due_ids)
+        fetch_time = pg.last_fetch_time
+        timer.record('fetch', fetch_time)
+        t_parse = time.perf_counter()
+        ratios = np.full(len(registry), np.nan)  # 只有本 tick 取到的代码才 push
+        for code_id in due_ids:
+            rec = fetched[code_id]
+            if rec is not None:
+                records[code_id] = rec
+                ratios[code_id] = rec.ratio
+        latest_ratios = np.array([rec.ratio if rec is not None else np.nan for rec in records])
+        latest_times = np.array([rec.timestamp if rec is not None else np.nan for rec in records])
+        prices = [rec.price if rec is not None else None for rec in records]
+        # 解析 = 生成 QuoteRecord + 汇总成数组
+        timer.record('parse', pg.last_parse_time + time.perf_counter() - t_parse)
+        with timer.stage('store'):
+            tick_store.push(ratios)  # 更新时间域数据
+            volatility = tick_store.volatility()
+        with timer.stage('alert'):
+            stock_hits, stock_crossed = stock_alert_engine.check_all(prices)
+            index_hits, index_crossed = index_alert_engine.check_all(prices)
+        t_render = time.perf_counter()
+
         # 获取股票数据
-        res_list = pg.grab(stock_list)
-        for i, res in enumerate(res_list):
-            stock_code = stock_list[i]
-            ratio = '-100.00%'
-            rf = -100.0
-            try:
-                ratio = res['ratio']
-                rf = float(ratio[:-1])
-                stock_tdl[i].push(rf)  # 更新时间域列表
-            except Exception as e:
-                print('Wrong value:', e)
+        for i, code_id in enumerate(stock_ids):
+            rec = records[code_id]
+            if rec is None:
+                log('No data:', stock_list[i])
+                continue
 
             volatility_s = ''
-            if stock_tdl[i].list[0] is not None:
-                volatility_ratio = stock_tdl[i].list[-1] - stock_tdl[i].list[0]
-                if volatility_ratio > 0:
-                    volatility_ratio = stock_tdl[i].list[-1] - min(stock_tdl[i].list)
-                else:
-                    volatility_ratio = stock_tdl[i].list[-1] - max(stock_tdl[i].list)
-                volatility_s = "%.2f%%" % volatility_ratio
-
-            alert_status = False
-            for alert in stock_alerts[i]:
-                alert_status = alert.check(float(res['current_price']))
-
-            if alert_status:
-                price_s = f"！【{res['current_price']}】"
-            else:
-                price_s = res['current_price']
-
-            # 添加当前股票信息到表格
-            stock_table.add_row([volatility_s, stock_code, res['stock_name'], res['current_price'], ratio,
-                                 res['today_low'], res['today_high'], res['current_time'], rf])
+            if not np.isnan(volatility[code_id]):
+                volatility_s = "%.2f%%" % volatility[code_id]
+
+            price_s = registry.price_formats[code_id] % rec.price
+            if stock_hits[i]:
+                price_s = f"！【{price_s}】"
+
+            # 添加当前股票信息到表格，只在这里格式化字符串
+            stock_table.add_row([volatility_s, stock_list[i], registry.names[code_id], price_s, '%.2f%%' % rec.ratio,
+                                 '%.2f%%' % rec.low_ratio(), '%.2f%%' % rec.high_ratio(), rec.time_str(), rec.ratio])
 
         # 获取指数数据
-        res_list = pg.grab(index_list)
-        for i, res in enumerate(res_list):
-            index_code = index_list[i]
-            ratio = '-100.00%'
-            rf = -100.0
-            try:
-                ratio = res['ratio']
-                rf = float(ratio[:-1])
-                index_tdl[i].push(rf)  # 更新时间域列表
-            except Exception as e:
-                print('Wrong value:', e)
+        for i, code_id in enumerate(index_ids):
+            rec = records[code_id]
+            if rec is None:
+                log('No data:', index_list[i])
+                continue
 
             volatility_s = ''
-            if index_tdl[i].list[0] is not None:
-                volatility_ratio = index_tdl[i].list[-1] - index_tdl[i].list[0]
-                if volatility_ratio > 0:
-                    volatility_ratio = index_tdl[i].list[-1] - min(index_tdl[i].list)
-                else:
-                    volatility_ratio = index_tdl[i].list[-1] - max(index_tdl[i].list)
-                volatility_s = "%.2f%%" % volatility_ratio
-
-            alert_status = False
-            # print(index_alerts[i])
-            for alert in index_alerts[i]:
-                alert_status = alert.check(float(res['current_price'])) or alert_status
-
-            if alert_status:
-                price_s = f"！【{res['current_price']}】"
-            else:
-                price_s = res['current_price']
+            if not np.isnan(volatility[code_id]):
+                volatility_s = "%.2f%%" % volatility[code_id]
+
+            price_s = registry.price_formats[code_id] % rec.price
+            if index_hits[i]:
+                price_s = f"！【{price_s}】"
 
             # 添加当前指数信息到表格
-            index_table.add_row([volatility_s, index_code, res['stock_name'], price_s, ratio,
-                                 res['today_low'], res['today_high'], res['current_time'], rf])
-
-        for portfolio_name in portfolio.keys():
-            p_stock_list = portfolio[portfolio_name]
-            total_ratio = 0
-            p_stock_res = pg.grab(p_stock_list)
-            if len(p_stock_res) == 0:
-                print("No result of pg.grab(), Check network.")
-                time.sleep(1.0)
+            index_table.add_row([volatility_s, index_list[i], registry.names[code_id], price_s, '%.2f%%' % rec.ratio,
+                                 '%.2f%%' % rec.low_ratio(), '%.2f%%' % rec.high_ratio(), rec.time_str(), rec.ratio])
+
+        # 本 tick 新触发的预警合并成一次通知，交给后台线程发送
+        dispatcher.submit(stock_crossed + index_crossed)
+
+        # 全部组合的加权涨跌幅由一次稀疏矩阵-向量乘积得到，缺报价的成分股被屏蔽
+        portfolio_ratios, portfolio_valid = portfolio_matrix.aggregate(latest_ratios)
+        portfolio_times = portfolio_matrix.latest(latest_times)
+        for col, portfolio_name in enumerate(portfolio_matrix.names):
+            if portfolio_valid[col] == 0:
+                log('No data:', portfolio_name)
                 continue
-            for res in p_stock_res:
-                total_ratio += float(res['ratio'][:-1])
-            avg_ratio_f = total_ratio / len(p_stock_list)
+            avg_ratio_f = float(portfolio_ratios[col])
             avg_ratio = '%.2f%%' % avg_ratio_f
             index_table.add_row(['', portfolio_name,
                         '', '', avg_ratio,
-                        '', '', res['current_time'], rf])
-
-        t_end = time.time()
-        print(time.strftime('%H:%M:%S', time.localtime(time.time())), f'取数据时间：{t_end - t_start:.3f}s')
-        stock_table.align = "r"
-        index_table.align = "r"
-        print(index_table.get_string(
-            fields=['volatility', 'code', 'name', 'price', 'ratio', 'today_low', 'today_high', 'time']))
-        print(stock_table.get_string(
-            fields=['volatility', 'code', 'name', 'price', 'ratio', 'today_low', 'today_high', 'time'],
-            sortby="ratio_f"))
-        time.sleep(2.45)
+                        '', '', time.strftime('%H:%M:%S', time.localtime(portfolio_times[col])), avg_ratio_f])
+
+        title = time.strftime('%H:%M:%S', time.localtime(time.time())) + f' 取数据时间：{fetch_time:.3f}s'
+        if args.status_line and timer.stages:
+            title += '  ' + timer.status_line()
+        if renderer is not None:
+            # 增量模式：去掉 ratio_f 列，按 ratio_f 排序后交给 DiffRenderer 逐格比较
+            stock_rows = sorted(stock_table.rows, key=lambda row: row[-1])
+            renderer.render(title, [(display_fields, [row[:-1] for row in index_table.rows]),
+                                    (display_fields, [row[:-1] for row in stock_rows])])
+        else:
+            print(title)
+            stock_table.align = "r"
+            index_table.align = "r"
+            print(index_table.get_string(fields=display_fields))
+            print(stock_table.get_string(fields=display_fields, sortby="ratio_f"))
+        t_end = time.perf_counter()
+        timer.record('render', t_end - t_render)
+        timer.record('tick', t_end - t_start)
+        if args.metrics_file:
+            timer.write_prometheus(args.metrics_file)
+
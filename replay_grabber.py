@@ -0,0 +1,96 @@
+import time
+
+from price_grabber import QuoteRecord
+from tick_recorder import TickDay, list_days
+
+
+class ReplayFinished(SystemExit):
+    """回放数据用完。继承 SystemExit，未捕获时视图脚本正常退出并执行 atexit 清理"""
+
+
+class ReplayGrabber(object):
+    """ 从 TickRecorder 录制的文件回放行情，接口与 Price_Grabber 相同
+
+    每次 grab_records 前进一个录制的 tick，返回请求代码在该时刻的最新报价。
+    speed 为回放倍速: 1 为实时，N 为 N 倍速，0 为不等待、尽可能快。
+    相邻 tick 间隔超过 max_gap 秒 (午休、隔夜) 时不等待，直接接续。
+    log 用于输出回放结束的统计，默认 print。
+    """
+    def __init__(self, directory, day=None, speed=1.0, start_time=None, max_gap=60.0, log=print):
+        self.days = [day] if day else list_days(directory)
+        self.directory = directory
+        self.speed = speed
+        self.start_time = start_time
+        self.max_gap = max_gap
+        self.log = log
+        self.latest = {}  # code -> QuoteRecord
+        self.ticks = self.iter_ticks()
+        self.tick_cnt = 0
+        self.wall_start = None
+        self.base_tick_time = None
+        self.base_wall_time = None
+        self.last_tick_time = None
+        self.last_fetch_time = 0.0  # 读取一个 tick 的耗时，不含按倍速等待的时间
+        self.last_parse_time = 0.0
+
+    def iter_ticks(self):
+        for day in self.days:
+            tick_day = TickDay(self.directory, day)
+            start = tick_day.seek(self.start_time) if self.start_time is not None else 0
+            for tick_time, rows in tick_day.iter_ticks(start):
+                yield tick_time, tick_day, rows
+
+    def wait_until(self, tick_time):
+        now = time.time()
+        if self.base_tick_time is None or tick_time - self.last_tick_time > self.max_gap:
+            self.base_tick_time = tick_time
+            self.base_wall_time = now
+        elif self.speed > 0:
+            delay = self.base_wall_time + (tick_time - self.base_tick_time) / self.speed - now
+            if delay > 0:
+                time.sleep(delay)
+        self.last_tick_time = tick_time
+
+    def advance(self):
+        try:
+            tick_time, tick_day, rows = next(self.ticks)
+        except StopIteration:
+            elapsed = time.time() - self.wall_start if self.wall_start else 0.0
+            rate = self.tick_cnt / elapsed if elapsed > 0 else 0.0
+            self.log(f'回放结束: {self.tick_cnt} ticks, {elapsed:.3f}s, {rate:.1f} ticks/s')
+            raise ReplayFinished(0)
+        if self.wall_start is None:
+            self.wall_start = time.time()
+        self.wait_until(float(tick_time))
+        t_start = time.perf_counter()
+        for code_id, timestamp, price, prev_close, high, low, ratio in rows.tolist():
+            code = tick_day.codes[code_id]
+            self.latest[code] = QuoteRecord(code, tick_day.names[code_id], price, prev_close,
+                                            high, low, ratio, timestamp)
+        self.last_fetch_time = time.perf_counter() - t_start
+        self.tick_cnt += 1
+
+    def grab_records(self, stocks_code):
+        self.advance()
+        records = {}
+        for code in dict.fromkeys(stocks_code):
+            if code in self.latest:
+                records[code] = self.latest[code]
+        return records
+
+    def grab_registry(self, registry, ids=None):
+        # 回放时每个 tick 都返回全部代码的最新报价，ids 只为与 Price_Grabber 接口一致
+        self.advance()
+        t_start = time.perf_counter()
+        records = [self.latest.get(code) for code in registry.codes]
+        for code_id, rec in enumerate(records):
+            if rec is not None and registry.names[code_id] is None:
+                registry.names[code_id] = rec.name
+        self.last_parse_time = time.perf_counter() - t_start
+        return records
+
+    def grab(self, stocks_code):
+        return [record.format() for record in self.grab_records(stocks_code).values()]
+
+    def close(self):
+        pass
@@ -0,0 +1,72 @@
+import os
+import time
+from contextlib import contextmanager
+
+import numpy as np
+
+QUANTILES = (0.5, 0.95, 0.99)
+
+
+class StageTimer(object):
+    """ 记录每个 tick 各阶段的耗时，保留最近 window 个样本计算滚动分位数
+
+    导出两种形式：Prometheus 文本格式的指标文件 (summary 类型，可由 node_exporter textfile 采集)，
+    以及一行状态文本 (阶段名 p50/p95/p99，毫秒)。
+
+    Attributes:
+        stages: 阶段名 -> 环形缓冲区 (秒)，按第一次记录的顺序排列
+        counts: 阶段名 -> 累计样本数
+        sums: 阶段名 -> 累计耗时 (秒)
+    """
+    def __init__(self, window=1000):
+        self.window = window
+        self.stages = {}
+        self.counts = {}
+        self.sums = {}
+
+    def record(self, stage, seconds):
+        samples = self.stages.get(stage)
+        if samples is None:
+            samples = self.stages[stage] = np.full(self.window, np.nan)
+            self.counts[stage] = 0
+            self.sums[stage] = 0.0
+        samples[self.counts[stage] % self.window] = seconds
+        self.counts[stage] += 1
+        self.sums[stage] += seconds
+
+    @contextmanager
+    def stage(self, stage):
+        t_start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.record(stage, time.perf_counter() - t_start)
+
+    def quantiles(self, stage):
+        """ 最近 window 个样本的 p50/p95/p99 (秒) """
+        samples = self.stages[stage]
+        return np.nanquantile(samples[:min(self.counts[stage], self.window)], QUANTILES)
+
+    def status_line(self):
+        parts = []
+        for stage in self.stages:
+            p50, p95, p99 = self.quantiles(stage) * 1000.0
+            parts.append(f'{stage} {p50:.1f}/{p95:.1f}/{p99:.1f}')
+        return 'p50/p95/p99 ms: ' + ' | '.join(parts)
+
+    def prometheus_text(self, name='ssviewer_stage_seconds'):
+        lines = [f'# HELP {name} Duration of each stage of a viewer tick, rolling window of {self.window} ticks',
+                 f'# TYPE {name} summary']
+        for stage in self.stages:
+            for q, value in zip(QUANTILES, self.quantiles(stage)):
+                lines.append(f'{name}{{stage="{stage}",quantile="{q}"}} {value:.6f}')
+            lines.append(f'{name}_sum{{stage="{stage}"}} {self.sums[stage]:.6f}')
+            lines.append(f'{name}_count{{stage="{stage}"}} {self.counts[stage]}')
+        return '\n'.join(lines) + '\n'
+
+    def write_prometheus(self, path):
+        # 先写临时文件再替换，采集方不会读到写了一半的文件
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
@@ -1,5 +1,6 @@
 import platform
 import subprocess
+from bisect import bisect_left, bisect_right
 
 
 def send_notification(title, message, app_name='ssviewer', timeout=10):
@@ -39,25 +40,44 @@ def send_notification(title, message, app_name='ssviewer', timeout=10):
             print(f"Notification: {title} - {message}")
 
 
+def format_alert_message(alerts):
+    return '\n'.join(f'{alert.stock_code} has reached the threshold {alert.threshold:g}.' for alert in alerts)
+
+
+def notify_alerts(alerts):
+    """把同一个 tick 内新触发的预警合并成一条通知（同步发送）"""
+    if not alerts:
+        return
+    send_notification(
+        title='ALERT ONCE',
+        message=format_alert_message(alerts),
+        app_name='ssviewer',
+        timeout=10  # 通知显示时间，单位是秒
+    )
+
+
 class Alert:
     def __init__(self, stock_code, price, alert_type):
         self.stock_code = stock_code
         self.price = price  # 预警价格
         self.alert_type = alert_type  # 预警类型（once, minute, every）
         self.triggered = False  # 是否已触发预警
+        # 解析一次阈值和方向，支持小数阈值；方向必须写明，否则无法判断是向上还是向下预警
+        if not price.startswith(('+', '-')):
+            raise ValueError(f"alert price {price!r} must start with '+' or '-'")
+        self.above = price.startswith('+')
+        self.threshold = float(price[1:])
+
+    def hit(self, current_price):
+        if self.above:
+            return current_price >= self.threshold
+        return current_price <= self.threshold
 
     def check(self, current_price):
-        threshold = int(self.price[1:])
-        if (self.price.startswith('+') and current_price >= threshold) or (
-                self.price.startswith('-') and current_price <= threshold):
+        if self.hit(current_price):
             if not self.triggered:
                 self.triggered = True  # 标记为已触发
-                send_notification(
-                    title='ALERT ONCE',
-                    message=f'{self.stock_code} has reached the threshold {threshold}.',
-                    app_name='ssviewer',
-                    timeout=10  # 通知显示时间，单位是秒
-                )
+                notify_alerts([self])
             return True  # 价格满足预警，返回True
         return False
 
@@ -66,6 +86,92 @@ class Alert:
             self.triggered = False  # 重置触发状态
 
 
+class AlertEngine:
+    """预编译的预警引擎
+
+    每个代码的预警按方向编译成两组有序阈值数组：向上预警升序、向下预警升序。
+    每个 tick 用二分查找一次得到全部被穿越的预警，复杂度与预警数量成对数关系。
+    已触发的预警用水位线跳过，只有新穿越的预警会被返回。
+    传入 ids (SymbolRegistry 的 id) 时，check_all 接收按 id 排列的整表价格向量。
+    """
+    def __init__(self, alert_list, ids=None):
+        self.ids = None if ids is None else [int(code_id) for code_id in ids]
+        self.above_prices = []
+        self.above_alerts = []
+        self.below_prices = []
+        self.below_alerts = []
+        self.above_notified = []  # 向上预警: 下标小于水位线的都已触发
+        self.below_notified = []  # 向下预警: 下标不小于水位线的都已触发
+        for alerts in alert_list:
+            above = sorted([a for a in alerts if a.above], key=lambda a: a.threshold)
+            below = sorted([a for a in alerts if not a.above], key=lambda a: a.threshold)
+            self.above_alerts.append(above)
+            self.above_prices.append([a.threshold for a in above])
+            self.below_alerts.append(below)
+            self.below_prices.append([a.threshold for a in below])
+            self.above_notified.append(0)
+            self.below_notified.append(len(below))
+
+    def check(self, idx, current_price):
+        """ 检查第 idx 个代码的预警
+
+        Returns:
+            (是否有预警处于满足状态, 本次新触发的预警列表)
+        """
+        # 向上预警: 阈值 <= 现价 的前 k 个被穿越
+        k = bisect_right(self.above_prices[idx], current_price)
+        # 向下预警: 阈值 >= 现价 的从 j 开始的都被穿越
+        j = bisect_left(self.below_prices[idx], current_price)
+        crossed = []
+        if k > self.above_notified[idx]:
+            crossed += [a for a in self.above_alerts[idx][self.above_notified[idx]:k] if not a.triggered]
+            self.above_notified[idx] = k
+        if j < self.below_notified[idx]:
+            crossed += [a for a in self.below_alerts[idx][j:self.below_notified[idx]] if not a.triggered]
+            self.below_notified[idx] = j
+        for alert in crossed:
+            alert.triggered = True
+        return k > 0 or j < len(self.below_prices[idx]), crossed
+
+    def check_all(self, prices):
+        """ 批量检查所有代码，None/NaN 表示本 tick 无数据
+
+        Args:
+            prices: 未传 ids 时与解析时的代码顺序一致；传了 ids 时按 SymbolRegistry 的 id 下标取价格
+
+        Returns:
+            (每个代码是否有预警满足的列表, 本 tick 新触发的全部预警)
+        """
+        hits = []
+        crossed = []
+        if self.ids is not None:
+            prices = [prices[code_id] for code_id in self.ids]
+        for idx, price in enumerate(prices):
+            if price is None or price != price:
+                hits.append(False)
+                continue
+            hit, new_alerts = self.check(idx, price)
+            hits.append(hit)
+            crossed += new_alerts
+        return hits, crossed
+
+    def reset(self):
+        """重置非 once 类型的预警，使其可以再次触发"""
+        for idx in range(len(self.above_alerts)):
+            for alert in self.above_alerts[idx] + self.below_alerts[idx]:
+                alert.reset()
+            above = self.above_alerts[idx]
+            below = self.below_alerts[idx]
+            k = 0
+            while k < len(above) and above[k].triggered:
+                k += 1
+            j = len(below)
+            while j > 0 and below[j - 1].triggered:
+                j -= 1
+            self.above_notified[idx] = k
+            self.below_notified[idx] = j
+
+
 class StockAlertParser:
     def __init__(self, file_path):
         self.file_path = file_path
@@ -86,13 +192,20 @@ class StockAlertParser:
                         if i + 1 < len(parts):  # 确保有配对的预警信息
                             alert_price = parts[i].strip()
                             alert_type = parts[i + 1].strip()
-                            alerts.append(Alert(stock_code, alert_price, alert_type))
+                            try:
+                                alerts.append(Alert(stock_code, alert_price, alert_type))
+                            except ValueError as e:
+                                print(f"{self.file_path}: skip alert of {stock_code}: {e}")
 
                     self.alert_list.append(alerts)
 
     def get_results(self):
         return self.stock_list, self.alert_list
 
+    def compile(self, registry=None):
+        ids = registry.id_array(self.stock_list) if registry is not None else None
+        return AlertEngine(self.alert_list, ids)
+
 
 # 测试代码
 if __name__ == "__main__":
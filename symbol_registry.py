@@ -0,0 +1,65 @@
+import numpy as np
+from easyquotation.helpers import get_stock_type
+
+
+def lot_size(code):
+    """ 每手股数：科创板 200，可转债 10，其余 100 """
+    if code.startswith('688'):
+        return 200
+    if code.startswith(('11', '12')):
+        return 10
+    return 100
+
+
+class SymbolRegistry(object):
+    """ 启动时建立一次的代码表，把每个代码映射成整数 id 并预先算好各项属性
+
+    grabber、TickStore、AlertEngine 和表格渲染都用 id 作为下标，tick 循环里不再做字符串判断。
+
+    Attributes:
+        codes: id -> 原始代码，例如 '600000' 或 'sh000001'
+        market_codes: id -> 带市场前缀的代码，例如 'sh600000'，即请求和返回结果的键
+        markets: id -> 'sh' / 'sz' / 'bj'
+        price_formats: id -> 价格格式，ETF/LOF ('5', '1' 开头) 三位小数，其余两位
+        lot_sizes: id -> 每手股数
+        names: id -> 显示名称，未知时为 None，由 resolve_names 或首次报价填充
+    """
+    def __init__(self, codes=()):
+        self.ids = {}
+        self.codes = []
+        self.market_codes = []
+        self.markets = []
+        self.price_formats = []
+        self.lot_sizes = []
+        self.names = []
+        for code in codes:
+            self.intern(code)
+
+    def __len__(self):
+        return len(self.codes)
+
+    def intern(self, code):
+        code_id = self.ids.get(code)
+        if code_id is None:
+            code_id = len(self.codes)
+            self.ids[code] = code_id
+            market = get_stock_type(code)
+            self.codes.append(code)
+            self.markets.append(market)
+            self.market_codes.append(market + code[-6:])
+            self.price_formats.append('%.3f' if code[-6] in ['5', '1'] else '%.2f')
+            self.lot_sizes.append(lot_size(code[-6:]))
+            self.names.append(None)
+        return code_id
+
+    def id_array(self, codes):
+        """ 代码列表 -> id 数组 (np.int64)，用于从整表向量中取出某个分区 """
+        return np.array([self.intern(code) for code in codes], dtype=np.int64)
+
+    def resolve_names(self, resolver):
+        """ 用 get_stock_names.StockNameResolver 预先填充名称（走本地缓存，通常不需要请求） """
+        names = resolver.resolve(self.codes)
+        for code_id, code in enumerate(self.codes):
+            name = names.get(code)
+            if name and not name.startswith('Unknown'):
+                self.names[code_id] = name
@@ -0,0 +1,141 @@
+import shutil
+import sys
+import threading
+from wcwidth import wcswidth, wcwidth
+
+
+CLEAR_SCREEN = '\033[2J'
+CLEAR_TO_END = '\033[J'
+HIDE_CURSOR = '\033[?25l'
+SHOW_CURSOR = '\033[?25h'
+
+
+def display_width(text):
+    width = wcswidth(text)
+    return len(text) if width < 0 else width
+
+
+def truncate(text, width):
+    """ 按显示宽度截断，超出时末尾用 ... 标记 """
+    if display_width(text) <= width:
+        return text
+    used = 0
+    for i, ch in enumerate(text):
+        used += max(wcwidth(ch), 0)
+        if used > width - 3:
+            return text[:i] + '...'
+    return text
+
+
+def move_to(row, col):
+    """ ANSI 光标定位，row/col 从 0 开始 """
+    return f'\033[{row + 1};{col + 1}H'
+
+
+class DiffRenderer(object):
+    """ 增量终端渲染：保留上一帧，每个 tick 只重绘内容有变化的单元格
+
+    表格列宽只增不减，行按 ratio_f 重新排序时整体布局保持不变，
+    每帧输出的字节数只与变化的单元格数量有关，而与表格大小无关。
+    标题下一行是状态行，status() 代替 print 输出提示信息，不会写到光标停留处打乱帧。
+    """
+    def __init__(self, stream=None, align='r'):
+        self.stream = stream or sys.stdout
+        self.align = align
+        self.widths = {}  # 表序号 -> 各列宽度
+        self.prev_frame = {}  # (行, 列起点) -> 上一帧该位置的文本
+        self.prev_row_cnt = 0
+        self.messages = []  # 上一帧之后的提示信息
+        self.lock = threading.Lock()  # 通知线程也会写状态行
+
+    def pad(self, text, width):
+        fill = ' ' * (width - display_width(text))
+        return fill + text if self.align == 'r' else text + fill
+
+    def update_widths(self, table_idx, field_names, rows):
+        widths = [display_width(name) for name in field_names]
+        for row in rows:
+            for i, cell in enumerate(row):
+                widths[i] = max(widths[i], display_width(cell))
+        old = self.widths.get(table_idx)
+        if old is not None:
+            widths = [max(w, o) for w, o in zip(widths, old)]
+        self.widths[table_idx] = widths
+        return widths != old
+
+    def table_lines(self, widths, field_names, rows):
+        """ 生成表格每一行的片段列表 [(列起点, 文本)]，边框与单元格分开，便于逐格比较 """
+        rule = '+' + '+'.join('-' * (w + 2) for w in widths) + '+'
+        lines = [[(0, rule)]]
+        for cells in [field_names] + list(rows):
+            segments = []
+            x = 0
+            for w, cell in zip(widths, cells):
+                segments.append((x, '|'))
+                segments.append((x + 1, ' ' + self.pad(cell, w) + ' '))
+                x += w + 3
+            segments.append((x, '|'))
+            lines.append(segments)
+            if cells is field_names:
+                lines.append([(0, rule)])
+        lines.append([(0, rule)])
+        return lines
+
+    def status_text(self):
+        # 状态行不能折行，否则下面的表格整体错位
+        return truncate(' | '.join(self.messages), shutil.get_terminal_size().columns - 1) + '\033[K'
+
+    def status(self, *args):
+        """ 与 print 参数相同，把提示信息追加到状态行并立即重绘该行，保留到下一帧之后 """
+        with self.lock:
+            self.messages.append(' '.join(str(arg) for arg in args))
+            text = self.status_text()
+            self.prev_frame[(1, 0)] = text
+            self.stream.write(move_to(1, 0) + text + move_to(self.prev_row_cnt, 0))
+            self.stream.flush()
+
+    def render(self, title, tables):
+        """ 绘制一帧
+
+        Args:
+            title: 首行文本，例如时间和取数耗时
+            tables: [(field_names, rows)]，rows 为已排好序的字符串单元格列表
+        """
+        with self.lock:
+            size = self.render_frame(title, tables)
+            self.messages = []
+        return size
+
+    def render_frame(self, title, tables):
+        layout_changed = False
+        # 标题长度可能变短，附带清除行尾残留；第二行为状态行
+        lines = [[(0, title + '\033[K')], [(0, self.status_text())]]
+        for table_idx, (field_names, rows) in enumerate(tables):
+            rows = [[str(cell) for cell in row] for row in rows]
+            layout_changed = self.update_widths(table_idx, field_names, rows) or layout_changed
+            lines += self.table_lines(self.widths[table_idx], field_names, rows)
+
+        out = []
+        if layout_changed:
+            # 列宽变化时整屏重绘，其余时候只输出变化的片段
+            out.append(HIDE_CURSOR + CLEAR_SCREEN)
+            self.prev_frame = {}
+        frame = {}
+        for row, segments in enumerate(lines):
+            for col, text in segments:
+                frame[(row, col)] = text
+                if self.prev_frame.get((row, col)) != text:
+                    out.append(move_to(row, col) + text)
+        if len(lines) < self.prev_row_cnt:
+            out.append(move_to(len(lines), 0) + CLEAR_TO_END)
+        out.append(move_to(len(lines), 0))
+        self.prev_frame = frame
+        self.prev_row_cnt = len(lines)
+        data = ''.join(out)
+        self.stream.write(data)
+        self.stream.flush()
+        return len(data)
+
+    def close(self):
+        self.stream.write(SHOW_CURSOR)
+        self.stream.flush()
@@ -0,0 +1,60 @@
+import numpy as np
+import pytest
+
+from modquant_backtest_n_loss_1_win import analyze_consecutive_losses_strategy, follow_rounds, sweep_consecutive_losses
+from modquant_win_lose_seq import write_packed
+
+SWEEP_COLUMNS = ['连败触发阈值', '跟单轮数', '总跟单次数', '总胜利次数', '总亏损次数', '总胜率']
+
+
+def reference_follow_mask(is_win, consecutive_losses):
+    """ 原 analyze_consecutive_losses_strategy 中逐个结果的跟单状态机 """
+    following = False
+    loss_count = 0
+    mask = []
+    for win in is_win:
+        if not following:
+            loss_count = 0 if win else loss_count + 1
+            if loss_count >= consecutive_losses:
+                following = True
+                loss_count = 0
+            mask.append(following)
+        else:
+            mask.append(True)
+            following = not win
+    return np.array(mask, dtype=bool)
+
+
+@pytest.mark.parametrize('consecutive_losses', [1, 2, 3, 5])
+def test_follow_rounds_matches_reference(consecutive_losses):
+    rng = np.random.default_rng(consecutive_losses)
+    for _ in range(300):
+        n = int(rng.integers(0, 80))
+        is_win = rng.random(n) < rng.uniform(0.1, 0.9)
+        round_starts, round_ends, mask = follow_rounds(is_win, consecutive_losses)
+        np.testing.assert_array_equal(mask, reference_follow_mask(is_win, consecutive_losses))
+        assert mask.sum() == (round_ends - round_starts).sum()
+
+
+@pytest.mark.parametrize('seed', range(5))
+def test_sweep_matches_single_n(tmp_path, seed):
+    rng = np.random.default_rng(seed)
+    file_path = tmp_path / 'seq.bin'
+    for _ in range(20):
+        n = int(rng.integers(1, 120))
+        # 不同的胜率，得到长短不一的连败
+        is_win = rng.random(n) < rng.uniform(0.1, 0.9)
+        write_packed(file_path, is_win)
+        sweep = sweep_consecutive_losses(is_win, 6)
+        for row in sweep.to_dict('records'):
+            expected = analyze_consecutive_losses_strategy(file_path, row['连败触发阈值'])
+            assert {column: row[column] for column in SWEEP_COLUMNS} == \
+                   pytest.approx({column: expected[column] for column in SWEEP_COLUMNS})
+
+
+def test_sweep_accepts_text():
+    sweep = sweep_consecutive_losses('负负胜负负负', 3)
+    # N=2: 负负胜 一轮(2 负 1 胜)，负负负 一轮未结束(2 负)
+    assert sweep['跟单轮数'].tolist() == [2, 2, 1]
+    assert sweep['总胜利次数'].tolist() == [1, 1, 0]
+    assert sweep['总亏损次数'].tolist() == [5, 3, 1]
@@ -0,0 +1,91 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modquant_backtest_n_loss_win_ratio import LossStreakFollower, backtest_follow_mask, walk_forward
+from modquant_metrics import compute_metrics
+
+
+def reference_follow_indices(results_seq, consecutive_losses, target_win_rate):
+    """ 原 analyze_strategy_from_csv 中的回测主逻辑，每一步重新统计本轮胜率 """
+    following = False
+    loss_count = 0
+    follow_indices = []
+    current_follow = []
+    for i, result in enumerate(results_seq):
+        if not following:
+            if result == '负':
+                loss_count += 1
+                if loss_count >= consecutive_losses:
+                    following = True
+                    loss_count = 0
+                    current_follow = [i]
+            else:
+                loss_count = 0
+        else:
+            current_follow.append(i)
+            streak_results = [results_seq[idx] for idx in current_follow]
+            win_rate = streak_results.count('胜') / len(streak_results) * 100
+            if win_rate >= target_win_rate:
+                follow_indices.extend(current_follow)
+                following = False
+                current_follow = []
+    if following and current_follow:
+        follow_indices.extend(current_follow)
+    return sorted(set(follow_indices))
+
+
+@pytest.mark.parametrize('consecutive_losses', [1, 2, 3, 5])
+@pytest.mark.parametrize('target_win_rate', [0.0, 33.3, 40.0, 50.0, 100.0])
+def test_follow_mask_matches_reference(consecutive_losses, target_win_rate):
+    rng = np.random.default_rng(consecutive_losses * 1000 + int(target_win_rate * 10))
+    for _ in range(100):
+        n = int(rng.integers(0, 120))
+        results_seq = np.where(rng.random(n) < rng.uniform(0.1, 0.9), '胜', '负').tolist()
+        mask = backtest_follow_mask(results_seq, consecutive_losses, target_win_rate)
+        expected = reference_follow_indices(results_seq, consecutive_losses, target_win_rate)
+        assert np.flatnonzero(mask).tolist() == expected
+
+
+def test_follower_accepts_bools():
+    rng = np.random.default_rng(0)
+    is_win = rng.random(500) < 0.45
+    results_seq = np.where(is_win, '胜', '负').tolist()
+    np.testing.assert_array_equal(backtest_follow_mask(is_win, 2, 40.0), backtest_follow_mask(results_seq, 2, 40.0))
+
+
+def test_follower_rounds():
+    follower = LossStreakFollower(consecutive_losses=2, target_win_rate=50.0)
+    selected = [follower.update(result) for result in ['负', '负', '负', '胜', '负', '负']]
+    # 第二个负触发跟单，之后本轮胜率最高 1/3，未达到 50%，一直选中
+    assert selected == [False, True, True, True, True, True]
+    assert follower.rounds == 1
+
+
+def test_walk_forward_matches_compute_metrics():
+    # 两位小数的盈亏反复加减会有舍入误差；300 段连胜让窗口内没有亏损段、也没有跟单
+    rng = np.random.default_rng(7)
+    profits = np.round(rng.normal(0, 50, 20000), 2)
+    profits[5000:5300] = np.abs(profits[5000:5300]) + 0.01
+    profits[rng.integers(0, len(profits), 200)] = 0.0  # 盈亏为 0 的负段
+    results = np.where(profits > 0, '胜', '负')
+    is_win = results == '胜'
+    window = 100
+
+    walk = walk_forward(pd.DataFrame({'结果': results, '总盈亏': profits}), 2, 40.0, window)
+    mask = backtest_follow_mask(results.tolist(), 2, 40.0)
+    assert len(walk) == len(profits) - window + 1
+    for start, row in enumerate(walk.to_dict('records')):
+        window_slice = slice(start, start + window)
+        expected = compute_metrics(profits[window_slice], mask[window_slice], is_win[window_slice])
+        assert row['窗口交易段数'] == expected['交易段数']
+        if expected['交易段数'] == 0:
+            assert np.isnan(row['窗口胜率'])
+        else:
+            assert row['窗口胜率'] == pytest.approx(expected['胜率'])
+        if np.isnan(expected['赔率']):
+            assert np.isnan(row['窗口赔率'])
+        else:
+            assert row['窗口赔率'] == pytest.approx(expected['赔率'], rel=1e-9)
+        assert row['窗口总盈利'] == pytest.approx(expected['总盈利'], abs=1e-6)
+        assert row['全跟单总盈利'] == pytest.approx(profits[window_slice].sum(), abs=1e-6)
@@ -0,0 +1,77 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from modquant_list_parse import BadLines, read_trades, segment_starts
+
+
+def reference_segment_starts(is_long, reverse_count):
+    """ 原 analyze_trades 中逐笔的震荡过滤分段，返回各段起点 """
+    group_ids = []
+    current_group = 0
+    main_direction = is_long[0] if len(is_long) > 0 else None
+    reverse_indices = []
+    for i, d in enumerate(is_long):
+        group_ids.append(current_group)
+        if d == main_direction:
+            reverse_indices = []
+        else:
+            reverse_indices.append(i)
+            if len(reverse_indices) == reverse_count:
+                # 从第一次反向单开始新段
+                for j in range(reverse_indices[0], i + 1):
+                    group_ids[j] = current_group + 1
+                current_group += 1
+                main_direction = is_long[reverse_indices[0]]
+                reverse_indices = []
+    group_ids = np.array(group_ids, dtype=np.int64)
+    return np.flatnonzero(np.concatenate(([True], group_ids[1:] != group_ids[:-1])))[:len(group_ids)]
+
+
+@pytest.mark.parametrize('reverse_count', [1, 2, 3, 5])
+def test_segment_starts_matches_reference(reverse_count):
+    rng = np.random.default_rng(reverse_count)
+    for _ in range(300):
+        n = int(rng.integers(0, 80))
+        # 不同的多空比例，得到长短不一的游程
+        is_long = rng.random(n) < rng.uniform(0.1, 0.9)
+        expected = reference_segment_starts(is_long.tolist(), reverse_count)
+        np.testing.assert_array_equal(segment_starts(is_long, reverse_count), expected)
+
+
+def test_segment_starts_examples():
+    long, short = True, False
+    # 不足 3 笔的反向单归入当前段
+    assert segment_starts([long, short, short, long, long]).tolist() == [0]
+    # 连续 3 笔反向单从第一笔反向单开始新段
+    assert segment_starts([long, long, short, short, short, long]).tolist() == [0, 2]
+    assert segment_starts([]).tolist() == []
+
+
+def write_trades(path, rows):
+    path.write_text(''.join('\t'.join(row) + '\n' for row in rows), encoding='utf-8')
+
+
+@pytest.mark.parametrize('chunksize', [1, 1000])
+def test_read_trades_chinese_dates(tmp_path, chunksize):
+    path = tmp_path / 'trades.txt'
+    write_trades(path, [['2024年01月02日 09:30', '2024年01月02日 10:30', '100', '101', '1', '1', '1'],
+                        ['2024年01月03日 09:30', '2024年01月03日 10:30', '100', '99', '-1', '0', '0']])
+    bad_lines = BadLines()
+    df = pd.concat(read_trades(path, chunksize, bad_lines), ignore_index=True)
+    assert df['进场日期'].tolist() == [pd.Timestamp('2024-01-02 09:30'), pd.Timestamp('2024-01-03 09:30')]
+    assert bad_lines.count == 0
+
+
+@pytest.mark.parametrize('chunksize', [1, 1000])
+def test_read_trades_keeps_unparsable_values(tmp_path, chunksize):
+    path = tmp_path / 'trades.txt'
+    write_trades(path, [['2024/01/02 09:30', '2024/01/02 10:30', '100', '101', '1', '1', '1'],
+                        ['20240105 0930', '20240105 1000', 'abc', '101', '1', '2', '2']])
+    bad_lines = BadLines()
+    df = pd.concat(read_trades(path, chunksize, bad_lines), ignore_index=True)
+    # 格式与第一行不同的日期保留原文，无法解析的价格为 NaN，该行被记录
+    assert df['出场日期'].tolist() == [pd.Timestamp('2024-01-02 10:30'), '20240105 1000']
+    assert np.isnan(df['进场价格'][1])
+    assert bad_lines.count == 1
+    assert bad_lines.samples[0].startswith('行 2，')
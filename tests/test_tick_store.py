@@ -0,0 +1,43 @@
+import numpy as np
+import pytest
+
+from tick_store import TickStore
+
+
+def reference_stats(history, element_cnt):
+    """ 逐代码保留最近 element_cnt 个有效样本，直接求窗口统计 """
+    first, last, win_min, win_max, volatility = [], [], [], [], []
+    for samples in history:
+        window = samples[-element_cnt:]
+        if not window:
+            first.append(np.nan), last.append(np.nan), win_min.append(np.nan), win_max.append(np.nan)
+            volatility.append(np.nan)
+            continue
+        first.append(window[0]), last.append(window[-1]), win_min.append(min(window)), win_max.append(max(window))
+        if len(window) < element_cnt:
+            volatility.append(np.nan)
+        elif window[-1] - window[0] > 0:
+            volatility.append(window[-1] - min(window))
+        else:
+            volatility.append(window[-1] - max(window))
+    return dict(first=first, last=last, min=win_min, max=win_max, volatility=volatility)
+
+
+@pytest.mark.parametrize('element_cnt', [1, 3, 20])
+def test_running_extrema_match_window_scan(element_cnt):
+    rng = np.random.default_rng(element_cnt)
+    symbol_cnt = 12
+    store = TickStore(symbol_cnt, element_cnt=element_cnt)
+    history = [[] for _ in range(symbol_cnt)]
+    for tick in range(400):
+        # 随机游走、单调序列和大量重复值，覆盖极值滑出窗口和并列极值的情况
+        values = np.concatenate([rng.normal(0, 1, 4), np.full(4, tick * 0.1), -np.full(2, tick * 0.1),
+                                 rng.integers(0, 3, 2).astype(float)])
+        values[rng.random(symbol_cnt) < 0.2] = np.nan
+        store.push(values)
+        for i, value in enumerate(values):
+            if not np.isnan(value):
+                history[i].append(value)
+        stats = store.stats()
+        for name, expected in reference_stats(history, element_cnt).items():
+            np.testing.assert_array_equal(stats[name], expected)
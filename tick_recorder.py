@@ -0,0 +1,149 @@
+import os
+import time
+import numpy as np
+
+
+# 每条 tick 记录的定长二进制格式，一个交易日一个文件，可直接 np.memmap 读回
+TICK_DTYPE = np.dtype([
+    ('code_id', '<u4'),
+    ('timestamp', '<f8'),
+    ('price', '<f8'),
+    ('prev_close', '<f8'),
+    ('high', '<f8'),
+    ('low', '<f8'),
+    ('ratio', '<f4'),
+])
+# 索引：每个 tick 一条，记录该 tick 的抓取时间和在数据文件中的起始行号
+INDEX_DTYPE = np.dtype([('tick_time', '<f8'), ('row', '<i8')])
+
+
+def day_paths(directory, day):
+    """ day 为 'YYYYMMDD'，返回 (数据文件, 索引文件, 代码表文件) """
+    base = os.path.join(directory, f'ticks_{day}')
+    return base + '.bin', base + '.idx', base + '.codes'
+
+
+class TickRecorder:
+    """ 追加写入 Price_Grabber 抓到的每个 tick
+
+    数据文件为 TICK_DTYPE 定长记录，代码表文件每行 '代码\\t名称'，行号即 code_id。
+    为了留在热路径上，记录先攒在内存里，每 flush_every 个 tick 一次性写入。
+    """
+    def __init__(self, directory, flush_every=10):
+        self.directory = directory
+        self.flush_every = flush_every
+        os.makedirs(directory, exist_ok=True)
+        self.day = None
+        self.code_ids = {}
+        self.rows = 0  # 当天已写入(含缓冲)的行数
+        self.pending_ticks = []
+        self.pending_index = []
+        self.pending_codes = []
+
+    def open_day(self, day):
+        self.flush()
+        self.day = day
+        data_path, index_path, codes_path = day_paths(self.directory, day)
+        # 同一天重启时续写，沿用已有的代码表
+        self.code_ids = {}
+        if os.path.exists(codes_path):
+            with open(codes_path, 'r', encoding='utf-8') as f:
+                for line in f:
+                    self.code_ids[line.rstrip('\n').split('\t')[0]] = len(self.code_ids)
+        self.rows = os.path.getsize(data_path) // TICK_DTYPE.itemsize if os.path.exists(data_path) else 0
+
+    def code_id(self, code, name):
+        code_id = self.code_ids.get(code)
+        if code_id is None:
+            code_id = len(self.code_ids)
+            self.code_ids[code] = code_id
+            self.pending_codes.append(f'{code}\t{name}\n')
+        return code_id
+
+    def record(self, records, tick_time=None):
+        """ 记录一个 tick
+
+        Args:
+            records: dict, code -> QuoteRecord (Price_Grabber.grab_records 的返回值)
+            tick_time: 抓取时间，默认当前时间
+        """
+        if not records:
+            return
+        tick_time = time.time() if tick_time is None else tick_time
+        day = time.strftime('%Y%m%d', time.localtime(tick_time))
+        if day != self.day:
+            self.open_day(day)
+        ticks = np.array([(self.code_id(code, rec.name), rec.timestamp, rec.price, rec.prev_close,
+                           rec.high, rec.low, rec.ratio) for code, rec in records.items()], dtype=TICK_DTYPE)
+        self.pending_index.append((tick_time, self.rows))
+        self.pending_ticks.append(ticks)
+        self.rows += len(ticks)
+        if len(self.pending_ticks) >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        if not self.pending_ticks:
+            return
+        data_path, index_path, codes_path = day_paths(self.directory, self.day)
+        # 先写代码表和数据，最后写索引，读端只会看到完整的 tick
+        if self.pending_codes:
+            with open(codes_path, 'a', encoding='utf-8') as f:
+                f.writelines(self.pending_codes)
+        with open(data_path, 'ab') as f:
+            f.write(np.concatenate(self.pending_ticks).tobytes())
+        with open(index_path, 'ab') as f:
+            f.write(np.array(self.pending_index, dtype=INDEX_DTYPE).tobytes())
+        self.pending_ticks = []
+        self.pending_index = []
+        self.pending_codes = []
+
+    def close(self):
+        self.flush()
+
+
+class TickDay:
+    """ 只读打开一个交易日的记录，数据通过 np.memmap 零拷贝映射
+
+    Attributes:
+        ticks: TICK_DTYPE 结构化数组 (memmap)，ticks['price'] 等字段为零拷贝视图
+        index: INDEX_DTYPE 数组，每个 tick 一条
+        codes: code_id -> 代码
+        names: code_id -> 名称
+    """
+    def __init__(self, directory, day):
+        data_path, index_path, codes_path = day_paths(directory, day)
+        self.codes = []
+        self.names = []
+        with open(codes_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                code, name = line.rstrip('\n').split('\t', 1)
+                self.codes.append(code)
+                self.names.append(name)
+        self.index = np.fromfile(index_path, dtype=INDEX_DTYPE)
+        row_cnt = os.path.getsize(data_path) // TICK_DTYPE.itemsize
+        if row_cnt > 0:
+            self.ticks = np.memmap(data_path, dtype=TICK_DTYPE, mode='r', shape=(row_cnt,))
+        else:
+            self.ticks = np.empty(0, dtype=TICK_DTYPE)
+
+    def __len__(self):
+        return len(self.index)
+
+    def tick(self, i):
+        """ 第 i 个 tick 的 (抓取时间, 记录切片) """
+        start = self.index['row'][i]
+        end = self.index['row'][i + 1] if i + 1 < len(self.index) else len(self.ticks)
+        return self.index['tick_time'][i], self.ticks[start:end]
+
+    def seek(self, tick_time):
+        """ 返回第一个抓取时间 >= tick_time 的 tick 序号 """
+        return int(np.searchsorted(self.index['tick_time'], tick_time, side='left'))
+
+    def iter_ticks(self, start=0):
+        for i in range(start, len(self.index)):
+            yield self.tick(i)
+
+
+def list_days(directory):
+    return sorted(name[6:14] for name in os.listdir(directory)
+                  if name.startswith('ticks_') and name.endswith('.bin'))
@@ -0,0 +1,90 @@
+import datetime
+import math
+import time
+from zoneinfo import ZoneInfo
+
+# 沪深交易时段（北京时间），含 9:15 开始的集合竞价
+# 按交易所时区判断，与本机时区无关
+MARKET_TZ = ZoneInfo('Asia/Shanghai')
+TRADING_SESSIONS = [(datetime.time(9, 15), datetime.time(11, 30)),
+                    (datetime.time(13, 0), datetime.time(15, 0))]
+
+
+def is_trading_time(t=None):
+    """ 是否处于沪深交易时段（只判断周一至周五，不含节假日） """
+    now = datetime.datetime.fromtimestamp(time.time() if t is None else t, MARKET_TZ)
+    if now.weekday() >= 5:
+        return False
+    return any(start <= now.time() < end for start, end in TRADING_SESSIONS)
+
+
+def next_session_start(t=None):
+    """ 下一个交易时段开始的时间戳，当前处于交易时段时返回 t """
+    t = time.time() if t is None else t
+    if is_trading_time(t):
+        return t
+    now = datetime.datetime.fromtimestamp(t, MARKET_TZ)
+    day = now.date()
+    while True:
+        if day.weekday() < 5:
+            for start, _ in TRADING_SESSIONS:
+                start_dt = datetime.datetime.combine(day, start, tzinfo=MARKET_TZ)
+                if start_dt > now:
+                    return start_dt.timestamp()
+        day += datetime.timedelta(days=1)
+
+
+class TickScheduler(object):
+    """ 按截止时间驱动的轮询调度
+
+    每组代码有自己的刷新周期，下一次截止时间 = 上一次截止时间 + 周期，
+    取数耗时不会让周期漂移；落后超过一个周期时跳过错过的 tick，不补发。
+    market_hours 为 True 时，非交易时段暂停到下一个交易时段开始。
+    log 用于输出暂停提示，默认 print，增量渲染时传入 DiffRenderer.status。
+
+    Attributes:
+        intervals: 组名 -> 刷新周期（秒）
+        next_due: 组名 -> 下一次截止时间
+    """
+    def __init__(self, intervals, market_hours=True, log=print):
+        self.intervals = dict(intervals)
+        self.market_hours = market_hours
+        self.log = log
+        self.next_due = None
+
+    def wait(self):
+        """ 阻塞到下一个截止时间
+
+        Returns:
+            本次到期的组名列表；第一次调用立即返回全部组
+        """
+        now = time.time()
+        if self.next_due is None:
+            self.reset(now)
+            return list(self.intervals)
+        if self.market_hours and not is_trading_time(now):
+            resume = next_session_start(now)
+            self.log(time.strftime('%H:%M:%S', time.localtime(now)),
+                     '非交易时段，暂停到', time.strftime('%m-%d %H:%M', time.localtime(resume)))
+            time.sleep(resume - now)
+            now = time.time()
+            self.reset(now)
+            return list(self.intervals)
+        while True:
+            deadline = min(self.next_due.values())
+            if deadline > now:
+                time.sleep(deadline - now)
+                now = time.time()
+            due = []
+            for group, next_due in self.next_due.items():
+                if next_due <= now:
+                    due.append(group)
+                    interval = self.intervals[group]
+                    # 跳过已错过的截止时间，保持固定相位
+                    missed = math.floor((now - next_due) / interval)
+                    self.next_due[group] = next_due + (missed + 1) * interval
+            if due:
+                return due
+
+    def reset(self, now):
+        self.next_due = {group: now + interval for group, interval in self.intervals.items()}
@@ -0,0 +1,92 @@
+import numpy as np
+
+
+class TickStore(object):
+    """ Columnar time domain store for many symbols, replaces one TimeDomainList per code
+
+    data is a symbols x window ring buffer. Every symbol keeps its own write position, so a symbol
+    without a valid value in some tick is simply not pushed (same as skipping TimeDomainList.push).
+
+    Window min/max are kept incrementally: a push only compares the new sample with the current extreme,
+    and a symbol's window is re-scanned only when the evicted sample was its extreme, so a tick costs
+    O(symbols) instead of O(symbols x window).
+
+    Attributes:
+        symbol_cnt: number of symbols (rows)
+        element_cnt: record how many frames' results per symbol
+        data: 2-D array of samples, shape (symbol_cnt, element_cnt)
+        valid: 2-D bool mask of slots that hold a sample
+        pos: next write slot of each symbol
+        count: valid samples of each symbol, at most element_cnt
+        win_min, win_max: running window min / max of each symbol, +-inf while empty
+    """
+    def __init__(self, symbol_cnt, element_cnt=20, dtype=np.float64):
+        self.symbol_cnt = symbol_cnt
+        self.element_cnt = element_cnt
+        self.data = np.zeros((symbol_cnt, element_cnt), dtype=dtype)
+        self.valid = np.zeros((symbol_cnt, element_cnt), dtype=bool)
+        self.pos = np.zeros(symbol_cnt, dtype=np.int64)
+        self.count = np.zeros(symbol_cnt, dtype=np.int64)
+        self.rows = np.arange(symbol_cnt)
+        self.win_min = np.full(symbol_cnt, np.inf)
+        self.win_max = np.full(symbol_cnt, -np.inf)
+
+    def push(self, values):
+        """ push one tick for all symbols at once
+
+        Args:
+            values: array-like of length symbol_cnt, NaN marks a symbol without value in this tick
+        """
+        values = np.asarray(values, dtype=self.data.dtype)
+        rows = self.rows[~np.isnan(values)]
+        cols = self.pos[rows]
+        new = values[rows]
+        # 窗口已满时被覆盖的是最旧的样本
+        evicted = np.where(self.count[rows] == self.element_cnt, self.data[rows, cols], np.nan)
+        self.data[rows, cols] = new
+        self.valid[rows, cols] = True
+        self.pos[rows] = (cols + 1) % self.element_cnt
+        self.count[rows] = np.minimum(self.count[rows] + 1, self.element_cnt)
+
+        # 新样本直接与当前极值比较；只有被移出的样本正是极值、且新样本没有取代它时才重新扫描该代码的窗口
+        old_min = self.win_min[rows]
+        old_max = self.win_max[rows]
+        self.win_min[rows] = np.minimum(old_min, new)
+        self.win_max[rows] = np.maximum(old_max, new)
+        rescan_min = rows[(evicted == old_min) & (new > old_min)]
+        rescan_max = rows[(evicted == old_max) & (new < old_max)]
+        if len(rescan_min):
+            self.win_min[rescan_min] = np.where(self.valid[rescan_min], self.data[rescan_min], np.inf).min(axis=1)
+        if len(rescan_max):
+            self.win_max[rescan_max] = np.where(self.valid[rescan_max], self.data[rescan_max], -np.inf).max(axis=1)
+
+    def stats(self):
+        """ window statistics of all symbols in one vectorized call
+
+        Returns:
+            dict of float arrays (NaN where a symbol has no sample): first, last, min, max,
+            change (last - first) and volatility (NaN until the window of the symbol is full)
+        """
+        has_data = self.count > 0
+        last = self.data[self.rows, (self.pos - 1) % self.element_cnt]
+        first = self.data[self.rows, (self.pos - self.count) % self.element_cnt]
+        first = np.where(has_data, first, np.nan)
+        last = np.where(has_data, last, np.nan)
+        win_min = np.where(has_data, self.win_min, np.nan)
+        win_max = np.where(has_data, self.win_max, np.nan)
+        change = last - first
+        # 与 TimeDomainList 的规则一致: 上涨看离最低点的距离，否则看离最高点的距离
+        volatility = np.where(change > 0, last - win_min, last - win_max)
+        volatility = np.where(self.count == self.element_cnt, volatility, np.nan)
+        return dict(first=first, last=last, min=win_min, max=win_max, change=change, volatility=volatility)
+
+    def volatility(self):
+        return self.stats()['volatility']
+
+
+if __name__ == '__main__':
+    store = TickStore(3, element_cnt=3)
+    store.push([1.0, 2.0, np.nan])
+    store.push([2.0, 1.0, 0.5])
+    store.push([0.5, 3.0, np.nan])
+    print(store.stats())